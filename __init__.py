@@ -1,6 +1,7 @@
-import pygame, time, math, random
-
-pygame.init()
+import pygame, time, math, random, json, csv, warnings, threading, queue
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+import numpy as np
 
 PI = math.pi
 TAU = math.tau
@@ -9,17 +10,211 @@ INF = math.inf
 NEG_INF = math.inf
 NAN = math.nan
 
+def init(*subsystems):
+    """
+    Starts pygame subsystems by name ("display", "font", "mixer", "joystick", ...), skipping the ones already running.
+    Without arguments everything is started, like pygame.init().
+    Nothing is started on import: Window starts the display and get_font starts the font module when they are first used,
+    so call init("mixer") yourself before playing sounds.
+    """
+    if not subsystems:
+        pygame.init()
+        return
+
+    for name in subsystems:
+        module = getattr(pygame, name)
+        if not module.get_init():
+            module.init()
+
+
+# Loaded fonts by (name, size, bold, italic)
+font_cache = {}
+
+
+def get_font(name=None, size=24, bold=False, italic=False):
+    """
+    Returns a font, loading it only the first time. name=None is pygame's default font, any other name is looked up with SysFont.
+    """
+    key = (name, size, bold, italic)
+    font = font_cache.get(key)
+    if font is None:
+        init("font")
+        if name is None:
+            font = pygame.font.Font(None, size)
+            font.set_bold(bold)
+            font.set_italic(italic)
+        else:
+            font = pygame.font.SysFont(name, size, bold, italic)
+        font_cache[key] = font
+
+    return font
+
+
+def shutdown():
+    """
+    Stops every pygame subsystem and forgets the loaded fonts, which stop working once the font module quits.
+    """
+    font_cache.clear()
+    pygame.quit()
+
+
+class _LazyFont:
+    # class attribute that loads its font through get_font on first access
+    def __init__(self, name, size, bold=False, italic=False):
+        self.key = (name, size, bold, italic)
+
+    def __get__(self, instance, owner):
+        return get_font(*self.key)
+
+
 def timer(func):
+    # records into the profiler while it is enabled, prints otherwise
     def wrapper(*args, **kwargs):
-        start = time.time()
+        if profiler.enabled:
+            with profiler.scope(func.__name__):
+                return func(*args, **kwargs)
+
+        start = time.perf_counter_ns()
         output = func(*args, **kwargs)
-        end = time.time()
-        print(f"Function {func.__name__} took {(end - start) * 1000:.2f} ms to execute.")
+        end = time.perf_counter_ns()
+        print(f"Function {func.__name__} took {(end - start) / 1e6:.2f} ms to execute.")
         return output
 
     return wrapper
 
 
+class _ProfilerScope:
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.begin(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.end()
+        return False
+
+
+_null_scope = nullcontext()
+
+
+class Profiler:
+    """
+    Low overhead per-frame profiler with nested named scopes.
+
+    with profiler.scope("physics"):
+        ...
+
+    Nested scopes are recorded as "parent/child". Times are summed per frame and the last `history` frames are kept,
+    so stats() can report mean, p95, p99 and max in milliseconds. run() records its own phases while the profiler is enabled.
+    When disabled, scope() returns a shared do-nothing context manager.
+    """
+    def __init__(self, enabled=False, history=300):
+        self.enabled = enabled
+        self.overlay = False
+        self.frames = deque(maxlen=history)
+        self.current = {}
+        self.stack = []
+        self.scopes = {}
+
+    def scope(self, name):
+        if not self.enabled:
+            return _null_scope
+
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = _ProfilerScope(self, name)
+        return scope
+
+    def begin(self, name):
+        path = self.stack[-1][0] + "/" + name if self.stack else name
+        self.stack.append((path, time.perf_counter_ns()))
+
+    def end(self):
+        end = time.perf_counter_ns()
+        path, start = self.stack.pop()
+        self.current[path] = self.current.get(path, 0) + end - start
+
+    def end_frame(self):
+        """
+        Stores the times of the current frame. run() calls this once per frame.
+        """
+        if self.current:
+            self.frames.append(self.current)
+            self.current = {}
+
+    def reset(self):
+        self.frames.clear()
+        self.current = {}
+        self.stack.clear()
+
+    def stats(self):
+        """
+        Returns {scope name: {"mean", "p95", "p99", "max"}} in milliseconds over the stored frames.
+        A scope that didn't run in a frame counts as 0 ms for that frame.
+        """
+        names = []
+        for frame in self.frames:
+            for name in frame:
+                if name not in names:
+                    names.append(name)
+
+        stats = {}
+        for name in names:
+            times = np.array([frame.get(name, 0) for frame in self.frames], dtype=float) / 1e6
+            p95, p99 = np.percentile(times, (95, 99))
+            stats[name] = {"mean": float(times.mean()), "p95": float(p95), "p99": float(p99), "max": float(times.max())}
+
+        return stats
+
+    def export_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"stats": self.stats(), "frames": [{name: ns / 1e6 for name, ns in frame.items()} for frame in self.frames]}, file, indent=4)
+
+    def export_csv(self, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("scope", "mean_ms", "p95_ms", "p99_ms", "max_ms"))
+            for name, values in self.stats().items():
+                writer.writerow((name, values["mean"], values["p95"], values["p99"], values["max"]))
+
+    def draw(self, surface, position=(4, 4), color=(255, 255, 0)):
+        """
+        Draws the current stats as text in the top left corner of the surface (screen coordinates).
+        """
+        font = get_font(None, 18)
+        x, y = position
+        for name, values in self.stats().items():
+            line = f"{name}: {values['mean']:.2f} ms  p95 {values['p95']:.2f}  p99 {values['p99']:.2f}  max {values['max']:.2f}"
+            rect = surface.blit(font.render(line, True, color), (x, y))
+            _track(surface, rect)
+            y += rect.height
+
+
+# Initialize Profiler GLOBALLY
+profiler = Profiler()
+
+
+def profile(name=None):
+    """
+    Decorator that records every call of the function as a profiler scope.
+    """
+    def decorator(func):
+        scope_name = name or func.__name__
+
+        def wrapper(*args, **kwargs):
+            with profiler.scope(scope_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 def clamp(value, min_value, max_value):
     return max(min_value, min(value, max_value))
 
@@ -32,41 +227,380 @@ def map_value(value, start1, stop1, start2, stop2):
     return start2 + (stop2 - start2) * ((value - start1) / (stop1 - start1))
 
 
+class Camera:
+    """
+    World to screen transform for the library's centered, y up coordinates:
+    screen x = (x - position.x) * factor + width // 2, screen y = -(y - position.y) * factor + height // 2.
+
+    factor is zoom * scale, where scale is the window's render scale (pixels of window.SURFACE per display pixel),
+    so the world looks the same on the display at every render scale. width and height are the size of window.SURFACE.
+
+    The offsets are precomputed in update(), which run() calls at the start of every frame (set_position and set_zoom
+    update right away). All draw helpers go through window.camera and skip shapes that are completely off screen.
+    """
+    __slots__ = ("position", "zoom", "scale", "factor", "width", "height", "offset_x", "offset_y")
+
+    def __init__(self, position=None, zoom=1.0):
+        self.position = position if position is not None else Vector2()
+        self.zoom = zoom
+        self.scale = 1.0
+        self.factor = zoom
+        self.width = 0
+        self.height = 0
+        self.offset_x = 0
+        self.offset_y = 0
+
+    def update(self, width=None, height=None, scale=None):
+        if width is not None:
+            self.width = width
+            self.height = height
+        if scale is not None:
+            self.scale = scale
+
+        self.factor = self.zoom * self.scale
+        self.offset_x = self.width // 2 - self.position.x * self.factor
+        self.offset_y = self.height // 2 + self.position.y * self.factor
+
+    def set_position(self, position):
+        self.position = position
+        self.update()
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+        self.update()
+
+    def to_screen(self, x, y):
+        return int(x * self.factor + self.offset_x), int(-y * self.factor + self.offset_y)
+
+    def to_screen_array(self, points):
+        """
+        Transforms an Nx2 float array of world points, returns an Nx2 int array of screen points.
+        """
+        screen = np.empty(points.shape, dtype=np.int64)
+        screen[:, 0] = points[:, 0] * self.factor + self.offset_x
+        screen[:, 1] = points[:, 1] * -self.factor + self.offset_y
+        return screen
+
+    def to_world(self, x, y):
+        """
+        Converts a display position (like pygame.mouse.get_pos()) to world coordinates.
+        """
+        return Vector2((x * self.scale - self.offset_x) / self.factor, (self.offset_y - y * self.scale) / self.factor)
+
+    def to_display(self, x, y):
+        """
+        Converts world coordinates to a display position, the inverse of to_world.
+        """
+        return (x * self.factor + self.offset_x) / self.scale, (-y * self.factor + self.offset_y) / self.scale
+
+    def world_bounds(self):
+        """
+        Returns the visible world area as (min_x, min_y, max_x, max_y).
+        """
+        top_left = self.to_world(0, 0)
+        bottom_right = self.to_world(self.width / self.scale, self.height / self.scale)
+        return top_left.x, bottom_right.y, bottom_right.x, top_left.y
+
+    def visible(self, left, top, right, bottom):
+        # screen space test, True if the box touches the screen
+        return right >= 0 and bottom >= 0 and left <= self.width and top <= self.height
+
+    def visible_array(self, left, top, right, bottom):
+        return (right >= 0) & (bottom >= 0) & (left <= self.width) & (top <= self.height)
+
+
+def _track(surface, rect):
+    # remembers the area drawn on the window surface in dirty rectangle mode
+    # (the single shape helpers do this check inline, so it costs nothing while the mode is off)
+    if window.dirty_rects_enabled and surface is window.SURFACE:
+        window.dirty_rects.append(rect)
+
+
+def _track_all(surface, rects):
+    if window.dirty_rects_enabled and surface is window.SURFACE:
+        window.dirty_rects.extend(rects)
+
+
+def _stroke(width, camera):
+    # outline / line width in screen pixels, 0 (filled) stays 0 and thin strokes don't disappear.
+    # The batched helpers call this once per batch
+    factor = camera.factor
+    if factor == 1 or width <= 0:
+        return width
+    return max(round(width * factor), 1)
+
+
+# The single shape helpers inline the camera transform and the bounds test (see Camera) because they are called
+# thousands of times per frame. With factor 1 (no zoom, no render scale) sizes and widths are used as they are.
+
 def draw_circle(surface, color, position, radius, width=0):
-    pygame.draw.circle(surface, color.tup(), (int(position.x) + window.WIDTH // 2, -int(position.y) + window.HEIGHT // 2), radius, width)
+    camera = window.camera
+    factor = camera.factor
+    if factor == 1:
+        x, y = int(position.x + camera.offset_x), int(camera.offset_y - position.y)
+    else:
+        x, y = int(position.x * factor + camera.offset_x), int(camera.offset_y - position.y * factor)
+        radius = radius * factor
+        if width > 0:
+            width = max(round(width * factor), 1)
+    if x + radius >= 0 and y + radius >= 0 and x - radius <= camera.width and y - radius <= camera.height:
+        rect = pygame.draw.circle(surface, color.tup(), (x, y), radius, width)
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            window.dirty_rects.append(rect)
 
 
 def draw_circle_2(surface, color, position, radius):
-    # draws a circle with alpha value
-    target_rect = pygame.Rect((int(position.x) + window.WIDTH // 2, -int(position.y) + window.HEIGHT // 2), (0, 0)).inflate((radius * 2, radius * 2))
-    shape_surf = pygame.Surface(target_rect.size, pygame.SRCALPHA)
-    pygame.draw.circle(shape_surf, color, (radius, radius), radius)
-    surface.blit(shape_surf, target_rect)
+    # draws a circle with alpha value (color is an RGBA tuple), the circle sprite is cached
+    camera = window.camera
+    factor = camera.factor
+    if factor == 1:
+        x, y = int(position.x + camera.offset_x), int(camera.offset_y - position.y)
+        radius = int(radius)
+    else:
+        x, y = int(position.x * factor + camera.offset_x), int(camera.offset_y - position.y * factor)
+        radius = int(radius * factor)
+    if x + radius >= 0 and y + radius >= 0 and x - radius <= camera.width and y - radius <= camera.height:
+        color = color.tup() if isinstance(color, Color) else tuple(color)
+        rect = surface.blit(circle_sprite(radius, color), (x - radius, y - radius))
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            window.dirty_rects.append(rect)
 
 
 def draw_rectangle(surface, color, position, size, width=0):
-    pygame.draw.rect(surface, color.tup(), pygame.Rect(position.x + window.WIDTH // 2, -position.y + window.HEIGHT // 2, size.x, size.y), width)
+    camera = window.camera
+    factor = camera.factor
+    if factor == 1:
+        x, y = int(position.x + camera.offset_x), int(camera.offset_y - position.y)
+        w, h = size.x, size.y
+    else:
+        x, y = int(position.x * factor + camera.offset_x), int(camera.offset_y - position.y * factor)
+        w, h = size.x * factor, size.y * factor
+        if width > 0:
+            width = max(round(width * factor), 1)
+    if x + w >= 0 and y + h >= 0 and x <= camera.width and y <= camera.height:
+        rect = pygame.draw.rect(surface, color.tup(), (x, y, w, h), width)
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            window.dirty_rects.append(rect)
 
 
 def draw_line(surface, color, start_pos, end_pos, width=1):
-    pygame.draw.line(
-        surface,
-        color.tup(),
-        (int(start_pos.x + window.WIDTH // 2), int(-start_pos.y + window.HEIGHT // 2)),
-        (int(end_pos.x + window.WIDTH // 2), int(-end_pos.y + window.HEIGHT // 2)),
-        width,
-    )
+    camera = window.camera
+    factor, offset_x, offset_y = camera.factor, camera.offset_x, camera.offset_y
+    if factor == 1:
+        x1, y1 = int(start_pos.x + offset_x), int(offset_y - start_pos.y)
+        x2, y2 = int(end_pos.x + offset_x), int(offset_y - end_pos.y)
+    else:
+        x1, y1 = int(start_pos.x * factor + offset_x), int(offset_y - start_pos.y * factor)
+        x2, y2 = int(end_pos.x * factor + offset_x), int(offset_y - end_pos.y * factor)
+        if width > 0:
+            width = max(round(width * factor), 1)
+    if (x1 if x1 > x2 else x2) + width >= 0 and (y1 if y1 > y2 else y2) + width >= 0 and (x1 if x1 < x2 else x2) - width <= camera.width and (y1 if y1 < y2 else y2) - width <= camera.height:
+        rect = pygame.draw.line(surface, color.tup(), (x1, y1), (x2, y2), width)
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            window.dirty_rects.append(rect)
 
 def draw_polygon(surface, color, points, width=0):
-    new_points = []
-    for point in points:
-        new_point = (int(point.x + window.WIDTH // 2), int(-point.y + window.HEIGHT // 2))
-        new_points.append(new_point)
+    # no separate bounds test, pygame clips polygons to the surface about as fast as we could test them
+    camera = window.camera
+    factor, offset_x, offset_y = camera.factor, camera.offset_x, camera.offset_y
+    new_points = [(int(point.x * factor + offset_x), int(offset_y - point.y * factor)) for point in points]
+    if width > 0 and factor != 1:
+        width = max(round(width * factor), 1)
 
-    pygame.draw.polygon(surface, color.tup(), new_points, width)
+    rect = pygame.draw.polygon(surface, color.tup(), new_points, width)
+    if window.dirty_rects_enabled and surface is window.SURFACE:
+        window.dirty_rects.append(rect)
 
 def set_point(surface, point, color):
-    surface.set_at((int(point.x + window.WIDTH // 2), int(-point.y + window.HEIGHT // 2)), color.tup())
+    camera = window.camera
+    screen_point = (int(point.x * camera.factor + camera.offset_x), int(camera.offset_y - point.y * camera.factor))
+    surface.set_at(screen_point, color.tup())
+    if window.dirty_rects_enabled and surface is window.SURFACE:
+        window.dirty_rects.append(pygame.Rect(screen_point, (1, 1)))
+
+def _point_array(points):
+    """
+    Converts points (list of Vector2, flat sequence, Nx2 array or Vector2Array) to an Nx2 float array.
+    """
+    if isinstance(points, _VectorArray):
+        return points.data
+    if isinstance(points, np.ndarray):
+        return points.reshape(-1, 2)
+    if len(points) and not np.isscalar(points[0]):
+        return np.array([(point.x, point.y) if isinstance(point, Vector2) else point for point in points], dtype=float).reshape(-1, 2)
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def _screen_points(points):
+    """
+    Converts world points (list of Vector2, flat sequence or Nx2 array) to an Nx2 int array in screen coordinates with window.camera.
+    """
+    return window.camera.to_screen_array(_point_array(points))
+
+
+def _select(values, indices):
+    # picks the entries of a list or array at the given indices
+    if isinstance(values, np.ndarray):
+        return values[indices]
+    return [values[index] for index in indices.tolist()]
+
+
+def _color_list(colors, count):
+    """
+    Expands a Color, an RGB(A) tuple, a sequence of Colors or an Nx3/Nx4 array to a list of count colors.
+    """
+    if isinstance(colors, Color):
+        return [colors.tup()] * count
+    if isinstance(colors, np.ndarray):
+        if colors.ndim == 1:
+            return [tuple(colors.tolist())] * count
+        return colors.tolist()
+    if isinstance(colors, tuple) and isinstance(colors[0], (int, float)):
+        return [colors] * count
+    return [color.tup() if isinstance(color, Color) else color for color in colors]
+
+
+def _value_list(values, count):
+    """
+    Expands a scalar, a Vector2 or a sequence/array of values to a list of count values.
+    """
+    if isinstance(values, (int, float)):
+        return [values] * count
+    if isinstance(values, Vector2):
+        return [values.tup()] * count
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return [value.tup() if isinstance(value, Vector2) else value for value in values]
+
+
+def draw_circles(surface, colors, positions, radii, width=0):
+    """
+    Draws many circles at once.
+    positions can be a list of Vector2, a flat sequence (x0, y0, x1, y1, ...) or an Nx2 array.
+    colors and radii can be a single value or one value per circle. Circles outside the screen are skipped.
+    """
+    camera = window.camera
+    width = _stroke(width, camera)
+    centers = _screen_points(positions)
+    count = len(centers)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), (count,)) * camera.factor
+    colors = _color_list(colors, count)
+
+    visible = camera.visible_array(centers[:, 0] - radii, centers[:, 1] - radii, centers[:, 0] + radii, centers[:, 1] + radii)
+    if not visible.all():
+        indices = np.flatnonzero(visible)
+        centers, radii, colors = centers[indices], radii[indices], _select(colors, indices)
+
+    circle = pygame.draw.circle
+    rects = [circle(surface, color, center, radius, width) for color, center, radius in zip(colors, centers.tolist(), radii.tolist())]
+    _track_all(surface, rects)
+
+
+def draw_circles_2(surface, colors, positions, radii):
+    """
+    Draws many translucent circles at once with a single Surface.blits call.
+    colors are RGBA tuples (or an Nx4 array), radii are whole numbers. Circle sprites come from circle_cache.
+    """
+    camera = window.camera
+    corners = _screen_points(positions)
+    count = len(corners)
+    radii = np.broadcast_to((np.asarray(radii, dtype=float) * camera.factor).astype(np.int64), (count,))
+    corners -= radii[:, None]
+    colors = _color_list(colors, count)
+
+    visible = camera.visible_array(corners[:, 0], corners[:, 1], corners[:, 0] + 2 * radii, corners[:, 1] + 2 * radii)
+    if not visible.all():
+        indices = np.flatnonzero(visible)
+        corners, radii, colors = corners[indices], radii[indices], _select(colors, indices)
+
+    sprites = {}
+    blit_sequence = []
+    for color, radius, corner in zip(colors, radii.tolist(), corners.tolist()):
+        key = (radius, tuple(color))
+        sprite = sprites.get(key)
+        if sprite is None:
+            sprite = sprites[key] = circle_sprite(radius, key[1])
+        blit_sequence.append((sprite, corner))
+
+    if window.dirty_rects_enabled and surface is window.SURFACE:
+        _track_all(surface, surface.blits(blit_sequence))
+    else:
+        surface.blits(blit_sequence, False)
+
+
+def draw_lines(surface, colors, start_positions, end_positions, width=1):
+    """
+    Draws many separate lines at once, from start_positions[i] to end_positions[i].
+    """
+    camera = window.camera
+    width = _stroke(width, camera)
+    starts = _screen_points(start_positions)
+    ends = _screen_points(end_positions)
+    colors = _color_list(colors, len(starts))
+
+    low, high = np.minimum(starts, ends) - width, np.maximum(starts, ends) + width
+    visible = camera.visible_array(low[:, 0], low[:, 1], high[:, 0], high[:, 1])
+    if not visible.all():
+        indices = np.flatnonzero(visible)
+        starts, ends, colors = starts[indices], ends[indices], _select(colors, indices)
+
+    line = pygame.draw.line
+    rects = [line(surface, color, start, end, width) for color, start, end in zip(colors, starts.tolist(), ends.tolist())]
+    _track_all(surface, rects)
+
+
+def draw_rects(surface, colors, positions, sizes, width=0):
+    """
+    Draws many rectangles at once. Like draw_rectangle, positions are the top left corners.
+    sizes can be a single Vector2 / (w, h) or one size per rectangle.
+    """
+    camera = window.camera
+    width = _stroke(width, camera)
+    corners = _screen_points(positions)
+    count = len(corners)
+    if isinstance(sizes, Vector2):
+        sizes = sizes.tup()
+    sizes = np.broadcast_to(_point_array(sizes) * camera.factor, (count, 2))
+    colors = _color_list(colors, count)
+
+    visible = camera.visible_array(corners[:, 0], corners[:, 1], corners[:, 0] + sizes[:, 0], corners[:, 1] + sizes[:, 1])
+    if not visible.all():
+        indices = np.flatnonzero(visible)
+        corners, sizes, colors = corners[indices], sizes[indices], _select(colors, indices)
+
+    rect = pygame.draw.rect
+    rects = [rect(surface, color, (x, y, w, h), width) for color, (x, y), (w, h) in zip(colors, corners.tolist(), sizes.tolist())]
+    _track_all(surface, rects)
+
+
+def draw_polygons(surface, colors, polygons, width=0):
+    """
+    Draws many polygons at once.
+    polygons can be a list of point lists or an MxKx2 array (M polygons with K points each).
+    """
+    if isinstance(polygons, np.ndarray):
+        sizes = np.full(polygons.shape[0], polygons.shape[1])
+        points = _screen_points(polygons)
+    else:
+        sizes = np.array([len(points) for points in polygons], dtype=np.int64)
+        points = _screen_points([point for points in polygons for point in points]) if len(polygons) else np.empty((0, 2), dtype=np.int64)
+
+    count = len(sizes)
+    colors = _color_list(colors, count)
+    starts = np.cumsum(sizes) - sizes
+    if count == 0:
+        return
+
+    low, high = np.minimum.reduceat(points, starts), np.maximum.reduceat(points, starts)
+    visible = window.camera.visible_array(low[:, 0], low[:, 1], high[:, 0], high[:, 1])
+
+    points = points.tolist()
+    polygon = pygame.draw.polygon
+    width = _stroke(width, window.camera)
+    rects = [polygon(surface, colors[index], points[start:start + size], width) for index, start, size in zip(np.flatnonzero(visible).tolist(), starts[visible].tolist(), sizes[visible].tolist())]
+
+    _track_all(surface, rects)
+
 
 def distance_between_points(p1, p2):
     return math.sqrt((p2.x - p1.x) ** 2 + (p2.y - p1.y) ** 2)
@@ -77,10 +611,9 @@ def random_float(min_value=0.0, max_value=1.0):
 
 
 def sign(value):
-    try:
-        return value / abs(value)
-    except ZeroDivisionError:
+    if value == 0:
         return 0
+    return value / abs(value)
 
 
 def rect_collision(rect1_position, rect1_scale, rect2_position, rect2_scale):
@@ -90,13 +623,219 @@ def rect_collision(rect1_position, rect1_scale, rect2_position, rect2_scale):
 
 
 def circle_collsion(circle1_position, circle1_radius, circle2_position, circle2_radius):
-    dst = circle1_position - circle2_position
-    dst = dst.magnitude()
+    # compares squared distances, so no square root is needed
+    dx = circle1_position.x - circle2_position.x
+    dy = circle1_position.y - circle2_position.y
+    radii = circle1_radius + circle2_radius
+
+    return dx * dx + dy * dy <= radii * radii
 
-    if dst > circle1_radius + circle2_radius:
-        return False
 
-    return True
+def _as_array(values, size=2):
+    # accepts Vector2Array/Vector3Array, arrays and sequences
+    if isinstance(values, _VectorArray):
+        return values.data
+    return np.asarray(values, dtype=float).reshape(-1, size)
+
+
+def circle_collisions(positions, radii, pairs):
+    """
+    Narrowphase for many circle pairs at once.
+    pairs is an Mx2 int array of indices into positions/radii (for example from broadphase_pairs), returns the colliding pairs.
+    """
+    positions = _as_array(positions)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(positions),))
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+    delta = positions[pairs[:, 0]] - positions[pairs[:, 1]]
+    sums = radii[pairs[:, 0]] + radii[pairs[:, 1]]
+
+    return pairs[np.einsum("ij,ij->i", delta, delta) <= sums * sums]
+
+
+def rect_collisions(mins, maxs, pairs):
+    """
+    Narrowphase for many axis aligned rectangle pairs at once, given their min and max corners. Returns the colliding pairs.
+    """
+    mins, maxs = _as_array(mins), _as_array(maxs)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+    a, b = pairs[:, 0], pairs[:, 1]
+    overlap = (mins[a] < maxs[b]).all(axis=1) & (mins[b] < maxs[a]).all(axis=1)
+
+    return pairs[overlap]
+
+
+def broadphase_pairs(mins, maxs, cell_size):
+    """
+    Finds all pairs of axis aligned boxes whose bounds overlap, using a uniform grid, in a few vectorized steps.
+    mins and maxs are Nx2 arrays of box corners (for circles: position -/+ radius). Returns an Mx2 int array of index pairs (i < j).
+    Works best when cell_size is about the size of the largest box.
+    """
+    mins, maxs = _as_array(mins), _as_array(maxs)
+    count = len(mins)
+    if count < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    low = np.floor(mins / cell_size).astype(np.int64)
+    high = np.floor(maxs / cell_size).astype(np.int64)
+    spans = high - low + 1
+    cells_per_box = spans[:, 0] * spans[:, 1]
+
+    # one entry per (box, covered cell)
+    boxes = np.repeat(np.arange(count), cells_per_box)
+    offsets = np.arange(len(boxes)) - np.repeat(np.cumsum(cells_per_box) - cells_per_box, cells_per_box)
+    cell_x = low[boxes, 0] + offsets % spans[boxes, 0]
+    cell_y = low[boxes, 1] + offsets // spans[boxes, 0]
+    keys = cell_x * 1_000_003 + cell_y
+
+    order = np.argsort(keys, kind="stable")
+    keys, boxes, cell_x, cell_y = keys[order], boxes[order], cell_x[order], cell_y[order]
+
+    # pair every entry with the entries after it in the same cell
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    group_end = np.repeat(ends, ends - starts)
+    counts = group_end - np.arange(len(keys)) - 1
+
+    first = np.repeat(np.arange(len(keys)), counts)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+    a, b = boxes[first], boxes[second]
+
+    # boxes sharing several cells show up once per shared cell, only keep the pair in the cell where their overlap starts
+    low_x, low_y = low[:, 0].copy(), low[:, 1].copy()
+    canonical = (cell_x[first] == np.maximum(low_x[a], low_x[b])) & (cell_y[first] == np.maximum(low_y[a], low_y[b]))
+    a, b = a[canonical], b[canonical]
+
+    # same test as rect_collisions, on contiguous columns
+    min_x, min_y, max_x, max_y = mins[:, 0].copy(), mins[:, 1].copy(), maxs[:, 0].copy(), maxs[:, 1].copy()
+    overlap = (min_x[a] < max_x[b]) & (min_x[b] < max_x[a]) & (min_y[a] < max_y[b]) & (min_y[b] < max_y[a])
+    a, b = a[overlap], b[overlap]
+
+    return np.column_stack((np.minimum(a, b), np.maximum(a, b)))
+
+
+class SpatialHash:
+    """
+    Uniform grid broadphase for circles and axis aligned rectangles that can be inserted, moved and removed one by one.
+    Objects are identified by any hashable id. For whole arrays of colliders that move every frame, broadphase_pairs is faster.
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {}
+        self.cell_ranges = {}
+
+    def _cell_range(self, bounds):
+        size = self.cell_size
+        return int(bounds[0] // size), int(bounds[1] // size), int(bounds[2] // size), int(bounds[3] // size)
+
+    def _add_to_cells(self, id, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self.cells.get((x, y))
+                if cell is None:
+                    cell = self.cells[(x, y)] = set()
+                cell.add(id)
+
+    def _remove_from_cells(self, id, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self.cells[(x, y)]
+                cell.discard(id)
+                if not cell:
+                    del self.cells[(x, y)]
+
+    def insert(self, id, min_x, min_y, max_x, max_y):
+        """
+        Inserts (or moves) an object with the given bounds.
+        """
+        bounds = (min_x, min_y, max_x, max_y)
+        cell_range = self._cell_range(bounds)
+        old_range = self.cell_ranges.get(id)
+
+        self.bounds[id] = bounds
+        if old_range == cell_range:
+            return
+
+        if old_range is not None:
+            self._remove_from_cells(id, old_range)
+        self._add_to_cells(id, cell_range)
+        self.cell_ranges[id] = cell_range
+
+    move = insert
+
+    def insert_rect(self, id, position, scale):
+        # same convention as rect_collision: position is the corner, scale the size
+        self.insert(id, position.x, position.y, position.x + scale.x, position.y + scale.y)
+
+    def insert_circle(self, id, position, radius):
+        self.insert(id, position.x - radius, position.y - radius, position.x + radius, position.y + radius)
+
+    move_rect = insert_rect
+    move_circle = insert_circle
+
+    def remove(self, id):
+        cell_range = self.cell_ranges.pop(id, None)
+        if cell_range is not None:
+            self._remove_from_cells(id, cell_range)
+            del self.bounds[id]
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+        self.cell_ranges.clear()
+
+    def query(self, min_x, min_y, max_x, max_y):
+        """
+        Returns the set of ids whose bounds overlap the given box.
+        """
+        found = set()
+        x0, y0, x1, y1 = self._cell_range((min_x, min_y, max_x, max_y))
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    found.update(cell)
+
+        bounds = self.bounds
+        return {id for id in found if bounds[id][0] < max_x and min_x < bounds[id][2] and bounds[id][1] < max_y and min_y < bounds[id][3]}
+
+    def query_point(self, position):
+        x, y = position.x, position.y
+        bounds = self.bounds
+        cell = self.cells.get((int(x // self.cell_size), int(y // self.cell_size)), ())
+        return {id for id in cell if bounds[id][0] <= x <= bounds[id][2] and bounds[id][1] <= y <= bounds[id][3]}
+
+    def query_circle(self, position, radius):
+        return self.query(position.x - radius, position.y - radius, position.x + radius, position.y + radius)
+
+    def candidate_pairs(self):
+        """
+        Returns a set of (id1, id2) pairs whose bounds overlap. Each pair appears once.
+        """
+        pairs = set()
+        bounds = self.bounds
+        for cell in self.cells.values():
+            if len(cell) < 2:
+                continue
+
+            ids = list(cell)
+            for i, a in enumerate(ids):
+                a_bounds = bounds[a]
+                for b in ids[i + 1:]:
+                    b_bounds = bounds[b]
+                    if a_bounds[0] < b_bounds[2] and b_bounds[0] < a_bounds[2] and a_bounds[1] < b_bounds[3] and b_bounds[1] < a_bounds[3]:
+                        if (b, a) not in pairs:
+                            pairs.add((a, b))
+
+        return pairs
+
+    def __len__(self):
+        return len(self.bounds)
+
 
 def runge_kutta_4(position, velocity, acceleration, dt):
     def f(pos, vel, accel):
@@ -119,6 +858,86 @@ def runge_kutta_4(position, velocity, acceleration, dt):
 
     return new_position, new_velocity
 
+
+def _state_array(values):
+    if isinstance(values, _VectorArray):
+        return values.data
+    return np.asarray(values, dtype=float)
+
+
+def _acceleration(acceleration, positions, velocities):
+    # acceleration can be a vector, a vector array, an array or a function(positions, velocities) -> array
+    if callable(acceleration):
+        return _state_array(acceleration(positions, velocities))
+    if isinstance(acceleration, (Vector2, Vector3)):
+        return np.array(acceleration.tup(), dtype=float)
+    return _state_array(acceleration)
+
+
+def _integration_result(positions, velocities, new_positions, new_velocities, in_place):
+    if in_place:
+        _state_array(positions)[...] = new_positions
+        _state_array(velocities)[...] = new_velocities
+        return positions, velocities
+
+    if isinstance(positions, _VectorArray):
+        return type(positions)(new_positions), type(velocities)(new_velocities)
+
+    return new_positions, new_velocities
+
+
+def integrate_rk4(positions, velocities, acceleration, dt, in_place=False):
+    """
+    Runge-Kutta 4 step for a whole population of bodies at once.
+    positions and velocities are Vector2Array/Vector3Array or NxD arrays. acceleration is a vector, one acceleration per body,
+    or a function(positions, velocities) that returns the accelerations as an NxD array.
+    Returns (new_positions, new_velocities); with in_place=True the inputs are overwritten and returned.
+    For a constant acceleration the result is the same as runge_kutta_4.
+    """
+    p, v = _state_array(positions), _state_array(velocities)
+    half_dt = dt / 2
+
+    k1_a = _acceleration(acceleration, p, v)
+    k2_v = v + k1_a * half_dt
+    k2_a = _acceleration(acceleration, p + v * half_dt, k2_v) if callable(acceleration) else k1_a
+    k3_v = v + k2_a * half_dt
+    k3_a = _acceleration(acceleration, p + k2_v * half_dt, k3_v) if callable(acceleration) else k1_a
+    k4_v = v + k3_a * dt
+    k4_a = _acceleration(acceleration, p + k3_v * dt, k4_v) if callable(acceleration) else k1_a
+
+    new_positions = p + (v + 2 * k2_v + 2 * k3_v + k4_v) * (dt / 6)
+    new_velocities = v + (k1_a + 2 * k2_a + 2 * k3_a + k4_a) * (dt / 6)
+
+    return _integration_result(positions, velocities, new_positions, new_velocities, in_place)
+
+
+def integrate_euler(positions, velocities, acceleration, dt, in_place=False):
+    """
+    Semi-implicit (symplectic) Euler step for a whole population: the velocity is updated first and then used to move the position.
+    Same arguments as integrate_rk4.
+    """
+    p, v = _state_array(positions), _state_array(velocities)
+
+    new_velocities = v + _acceleration(acceleration, p, v) * dt
+    new_positions = p + new_velocities * dt
+
+    return _integration_result(positions, velocities, new_positions, new_velocities, in_place)
+
+
+def integrate_verlet(positions, velocities, acceleration, dt, in_place=False):
+    """
+    Velocity Verlet step for a whole population. Same arguments as integrate_rk4.
+    A function acceleration is evaluated at the old and at the new positions.
+    """
+    p, v = _state_array(positions), _state_array(velocities)
+
+    a = _acceleration(acceleration, p, v)
+    new_positions = p + v * dt + a * (dt * dt / 2)
+    new_a = _acceleration(acceleration, new_positions, v) if callable(acceleration) else a
+    new_velocities = v + (a + new_a) * (dt / 2)
+
+    return _integration_result(positions, velocities, new_positions, new_velocities, in_place)
+
 def sin(x):
     return math.sin(x)
 
@@ -158,14 +977,189 @@ def atanh(x):
 def atan2(y, x):
     return math.atan2(y, x)
 
+
+def _unwrap(value):
+    return value.data if isinstance(value, _VectorArray) else value
+
+
+def _array_result(result, like, out=None):
+    # gives results for Vector2Array/Vector3Array inputs back as the same type
+    if out is not None:
+        return out
+    if isinstance(like, _VectorArray):
+        return type(like)(result)
+    return result
+
+
+class ArrayMath:
+    """
+    Versions of clamp, lerp, map_value, sign and the trig wrappers for NumPy arrays and Vector2Array/Vector3Array.
+    Every function takes an optional out= array (or vector array) to write the result into instead of allocating a new one.
+    The scalar functions stay as they are, use these through the global vmath:
+
+    vmath.clamp(values, 0, 1, out=values)
+    """
+    @staticmethod
+    def clamp(value, min_value, max_value, out=None):
+        return _array_result(np.clip(_unwrap(value), min_value, max_value, out=_unwrap(out)), value, out)
+
+    @staticmethod
+    def lerp(start, end, t, out=None):
+        difference = np.subtract(_unwrap(end), _unwrap(start), dtype=float)
+        if np.ndim(t) == 1 and difference.ndim == 2:
+            # one t per vector
+            t = np.asarray(t)[:, None]
+        if isinstance(difference, np.ndarray) and np.broadcast_shapes(difference.shape, np.shape(t)) == difference.shape:
+            np.multiply(difference, t, out=difference)
+        else:
+            difference = difference * t
+        return _array_result(np.add(_unwrap(start), difference, out=_unwrap(out)), start, out)
+
+    @staticmethod
+    def map_value(value, start1, stop1, start2, stop2, out=None):
+        result = np.subtract(_unwrap(value), start1, out=_unwrap(out), dtype=float if out is None else None)
+        np.multiply(result, (stop2 - start2) / (stop1 - start1), out=result)
+        np.add(result, start2, out=result)
+        return _array_result(result, value, out)
+
+    @staticmethod
+    def sign(value, out=None):
+        return _array_result(np.sign(_unwrap(value), out=_unwrap(out)), value, out)
+
+    @staticmethod
+    def sin(x, out=None):
+        return _array_result(np.sin(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def cos(x, out=None):
+        return _array_result(np.cos(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def tan(x, out=None):
+        return _array_result(np.tan(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def asin(x, out=None):
+        return _array_result(np.arcsin(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def acos(x, out=None):
+        return _array_result(np.arccos(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def atan(x, out=None):
+        return _array_result(np.arctan(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def sinh(x, out=None):
+        return _array_result(np.sinh(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def cosh(x, out=None):
+        return _array_result(np.cosh(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def tanh(x, out=None):
+        return _array_result(np.tanh(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def asinh(x, out=None):
+        return _array_result(np.arcsinh(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def acosh(x, out=None):
+        return _array_result(np.arccosh(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def atanh(x, out=None):
+        return _array_result(np.arctanh(_unwrap(x), out=_unwrap(out)), x, out)
+
+    @staticmethod
+    def atan2(y, x, out=None):
+        return _array_result(np.arctan2(_unwrap(y), _unwrap(x), out=_unwrap(out)), y, out)
+
+
+# Initialize ArrayMath GLOBALLY
+vmath = ArrayMath()
+
 class Color:
+    """
+    RGB color. The tuple (tup()) and the mapped pixel value for a surface (mapped()) are cached
+    and only rebuilt after a channel changes, so drawing with the same color many times is cheap.
+    """
+    __slots__ = ("_r", "_g", "_b", "_tup", "_mapped")
+
     def __init__(self, r=0, g=0, b=0):
-        self.r = r
-        self.g = g
-        self.b = b
+        self._r = r
+        self._g = g
+        self._b = b
+        self._tup = None
+        self._mapped = None
+
+    @staticmethod
+    def _clamped(r, g, b):
+        # new color with every channel clamped to 0-255
+        return Color(0 if r < 0 else 255 if r > 255 else r, 0 if g < 0 else 255 if g > 255 else g, 0 if b < 0 else 255 if b > 255 else b)
+
+    @property
+    def r(self):
+        return self._r
+
+    @r.setter
+    def r(self, value):
+        self._r = value
+        self._tup = self._mapped = None
+
+    @property
+    def g(self):
+        return self._g
+
+    @g.setter
+    def g(self, value):
+        self._g = value
+        self._tup = self._mapped = None
+
+    @property
+    def b(self):
+        return self._b
+
+    @b.setter
+    def b(self, value):
+        self._b = value
+        self._tup = self._mapped = None
+
+    def set(self, r, g, b):
+        """
+        Sets all channels in place and returns the color.
+        """
+        self._r = r
+        self._g = g
+        self._b = b
+        self._tup = self._mapped = None
+        return self
+
+    def copy_from(self, other):
+        """
+        Copies the channels of another color into this one.
+        """
+        return self.set(other._r, other._g, other._b)
+
+    def copy(self):
+        return Color(self._r, self._g, self._b)
 
     def tup(self):
-        return self.r, self.g, self.b
+        if self._tup is None:
+            self._tup = (self._r, self._g, self._b)
+        return self._tup
+
+    def mapped(self, surface):
+        """
+        Returns the color as a packed pixel value for the surface (surface.map_rgb), cached for the last surface used.
+        """
+        mapped = self._mapped
+        if mapped is None or mapped[0] is not surface:
+            mapped = self._mapped = (surface, surface.map_rgb(self.tup()))
+        return mapped[1]
 
     @staticmethod
     def random():
@@ -175,74 +1169,235 @@ class Color:
         """
         Blends two colors based on a ratio.
         """
-        r = int(self.r * ratio + other.r * (1 - ratio))
-        g = int(self.g * ratio + other.g * (1 - ratio))
-        b = int(self.b * ratio + other.b * (1 - ratio))
+        r = int(self._r * ratio + other._r * (1 - ratio))
+        g = int(self._g * ratio + other._g * (1 - ratio))
+        b = int(self._b * ratio + other._b * (1 - ratio))
         return Color(r, g, b)
 
     def __repr__(self) -> str:
-        return f"{self.r} {self.g} {self.b}"
+        return f"{self._r} {self._g} {self._b}"
     
     def __add__(self, other):
         """
         Adds color value with another color value or int/float
         """
-        if isinstance(other, Color):
-            return Color(clamp(self.r + other.r, 0, 255), clamp(self.g + other.g, 0, 255), clamp(self.b + other.b, 0, 255))
+        if other.__class__ is Color or isinstance(other, Color):
+            return Color._clamped(self._r + other._r, self._g + other._g, self._b + other._b)
         elif isinstance(other, (int, float)):
-            return Color(clamp(self.r + other, 0, 255), clamp(self.g + other, 0, 255), clamp(self.b + other, 0, 255))
+            return Color._clamped(self._r + other, self._g + other, self._b + other)
         return NotImplemented
     
     def __sub__(self, other):
         """
         Subtracts color value with another color value or int/float
         """
-        if isinstance(other, Color):
-            return Color(clamp(self.r - other.r, 0, 255), clamp(self.g - other.g, 0, 255), clamp(self.b - other.b, 0, 255))
+        if other.__class__ is Color or isinstance(other, Color):
+            return Color._clamped(self._r - other._r, self._g - other._g, self._b - other._b)
         elif isinstance(other, (int, float)):
-            return Color(clamp(self.r - other, 0, 255), clamp(self.g - other, 0, 255), clamp(self.b - other, 0, 255))
+            return Color._clamped(self._r - other, self._g - other, self._b - other)
         return NotImplemented
     
     def __mul__(self, other):
         """
         Multiplies color value with another color value or int/float
         """
-        if isinstance(other, Color):
-            return Color(clamp(self.r * other.r, 0, 255), clamp(self.g * other.g, 0, 255), clamp(self.b * other.b, 0, 255))
+        if other.__class__ is Color or isinstance(other, Color):
+            return Color._clamped(self._r * other._r, self._g * other._g, self._b * other._b)
         elif isinstance(other, (int, float)):
-            return Color(clamp(self.r * other, 0, 255), clamp(self.g * other, 0, 255), clamp(self.b * other, 0, 255))
+            return Color._clamped(self._r * other, self._g * other, self._b * other)
         return NotImplemented
     
     def __truediv__(self, other):
         """
         Divides color value with another color value or int/float
         """
-        if isinstance(other, Color):
-            return Color(clamp(self.r / other.r, 0, 255), clamp(self.g / other.g, 0, 255), clamp(self.b / other.b, 0, 255))
+        if other.__class__ is Color or isinstance(other, Color):
+            return Color._clamped(self._r / other._r, self._g / other._g, self._b / other._b)
         elif isinstance(other, (int, float)):
-            return Color(clamp(self.r / other, 0, 255), clamp(self.g / other, 0, 255), clamp(self.b / other, 0, 255))
+            return Color._clamped(self._r / other, self._g / other, self._b / other)
         return NotImplemented
 
+    def __iadd__(self, other):
+        """
+        Adds color value with another color value or int/float in place
+        """
+        if other.__class__ is Color or isinstance(other, Color):
+            return self._set_clamped(self._r + other._r, self._g + other._g, self._b + other._b)
+        elif isinstance(other, (int, float)):
+            return self._set_clamped(self._r + other, self._g + other, self._b + other)
+        return NotImplemented
+
+    def __isub__(self, other):
+        """
+        Subtracts color value with another color value or int/float in place
+        """
+        if other.__class__ is Color or isinstance(other, Color):
+            return self._set_clamped(self._r - other._r, self._g - other._g, self._b - other._b)
+        elif isinstance(other, (int, float)):
+            return self._set_clamped(self._r - other, self._g - other, self._b - other)
+        return NotImplemented
+
+    def __imul__(self, other):
+        """
+        Multiplies color value with another color value or int/float in place
+        """
+        if other.__class__ is Color or isinstance(other, Color):
+            return self._set_clamped(self._r * other._r, self._g * other._g, self._b * other._b)
+        elif isinstance(other, (int, float)):
+            return self._set_clamped(self._r * other, self._g * other, self._b * other)
+        return NotImplemented
+
+    def __itruediv__(self, other):
+        """
+        Divides color value with another color value or int/float in place
+        """
+        if other.__class__ is Color or isinstance(other, Color):
+            return self._set_clamped(self._r / other._r, self._g / other._g, self._b / other._b)
+        elif isinstance(other, (int, float)):
+            return self._set_clamped(self._r / other, self._g / other, self._b / other)
+        return NotImplemented
+
+    def _set_clamped(self, r, g, b):
+        return self.set(0 if r < 0 else 255 if r > 255 else r, 0 if g < 0 else 255 if g > 255 else g, 0 if b < 0 else 255 if b > 255 else b)
+
+
+class FrozenColor(Color):
+    """
+    Color that can't be changed, used for the shared constants (RED, WHITE, ...).
+    In place operators return a new Color instead, so c = RED; c -= 100 leaves RED alone like it always did.
+    """
+    __slots__ = ()
+
+    def _frozen(self, *args):
+        raise AttributeError(f"{self!r} is a shared color constant, change a copy() of it instead")
+
+    r = property(Color.r.fget, _frozen)
+    g = property(Color.g.fget, _frozen)
+    b = property(Color.b.fget, _frozen)
+    set = _frozen
+
+    def __iadd__(self, other):
+        return self + other
+
+    def __isub__(self, other):
+        return self - other
+
+    def __imul__(self, other):
+        return self * other
+
+    def __itruediv__(self, other):
+        return self / other
+
+
+def _color_array(colors):
+    # Color, sequence of Colors or Nx3 array -> float array
+    if isinstance(colors, Color):
+        return np.array(colors.tup(), dtype=float)
+    if isinstance(colors, np.ndarray):
+        return colors.astype(float)
+    return np.array([color.tup() if isinstance(color, Color) else color for color in colors], dtype=float)
+
+
+def blend_colors(colors1, colors2, ratios, out=None):
+    """
+    Color.blend for many colors at once: colors1 * ratio + colors2 * (1 - ratio), truncated to whole numbers like Color.blend.
+    colors can be a Color, a list of Colors or an Nx3 array, ratios one number or one per color. Returns an Nx3 uint8 array.
+    """
+    colors1, colors2 = _color_array(colors1), _color_array(colors2)
+    ratios = np.asarray(ratios, dtype=float)
+    if ratios.ndim == 1:
+        ratios = ratios[:, None]
+
+    blended = colors2 + (colors1 - colors2) * ratios
+    if out is None:
+        return blended.astype(np.uint8)
+
+    np.copyto(out, blended, casting="unsafe")
+    return out
+
+
+class Gradient:
+    """
+    Precomputed color lookup table (size x 3 uint8 array in self.lut) that goes through the given colors.
+    positions (0 to 1, one per color) default to evenly spaced. Sample it with sample(t) for arrays of t in 0-1,
+    or index self.lut directly when you already have indices (palette style).
+    """
+    def __init__(self, colors, positions=None, size=256):
+        stops = _color_array(colors).reshape(-1, 3)
+        if positions is None:
+            positions = np.linspace(0, 1, len(stops))
+
+        t = np.linspace(0, 1, size)
+        self.size = size
+        self.lut = np.stack([np.interp(t, positions, stops[:, channel]) for channel in range(3)], axis=1).astype(np.uint8)
+
+    def indices(self, t):
+        return np.clip((np.asarray(t) * (self.size - 1)).astype(np.int64), 0, self.size - 1)
+
+    def sample(self, t, out=None):
+        """
+        Returns the colors for an array of t values (0 to 1) as an Nx3 uint8 array.
+        """
+        return np.take(self.lut, self.indices(t), axis=0, out=out)
+
+    def color(self, t):
+        return Color(*self.lut[self.indices(t)].tolist())
+
+    def __getitem__(self, index):
+        return self.lut[index]
+
+    def __len__(self):
+        return self.size
+
+
+BLACK = FrozenColor(0, 0, 0)
+DGRAY = FrozenColor(64, 64, 64)
+GRAY = FrozenColor(128, 128, 128)
+LGRAY = FrozenColor(200, 200, 200)
+WHITE = FrozenColor(255, 255, 255)
+RED = FrozenColor(255, 0, 0)
+GREEN = FrozenColor(0, 255, 0)
+BLUE = FrozenColor(0, 0, 255)
+YELLOW = FrozenColor(255, 255, 0)
+CYAN = FrozenColor(0, 255, 255)
+MAGENTA = FrozenColor(255, 0, 255)
+PURPLE = FrozenColor(128, 0, 128)
+ORANGE = FrozenColor(128, 52, 32)
 
-BLACK = Color(0, 0, 0)
-DGRAY = Color(64, 64, 64)
-GRAY = Color(128, 128, 128)
-LGRAY = Color(200, 200, 200)
-WHITE = Color(255, 255, 255)
-RED = Color(255, 0, 0)
-GREEN = Color(0, 255, 0)
-BLUE = Color(0, 0, 255)
-YELLOW = Color(255, 255, 0)
-CYAN = Color(0, 255, 255)
-MAGENTA = Color(255, 0, 255)
-PURPLE = Color(128, 0, 128)
-ORANGE = Color(128, 52, 32)
-
 class Vector2:
+    __slots__ = ("x", "y")
+
     def __init__(self, x=0, y=0):
         self.x = x
         self.y = y
 
+    def set(self, x, y):
+        """
+        Sets both components in place and returns the vector.
+        """
+        self.x = x
+        self.y = y
+        return self
+
+    def copy_from(self, other):
+        """
+        Copies the components of another vector into this one.
+        """
+        self.x = other.x
+        self.y = other.y
+        return self
+
+    def copy(self):
+        return Vector2(self.x, self.y)
+
+    def add_scaled(self, other, factor):
+        """
+        Adds other * factor to this vector in place (pos.add_scaled(vel, dt) is pos += vel * dt without temporaries).
+        """
+        self.x += other.x * factor
+        self.y += other.y * factor
+        return self
+
     @staticmethod
     def random(min, max):
         x = random_float(min.x, max.x)
@@ -332,7 +1487,7 @@ class Vector2:
 
     # Addition
     def __add__(self, other):
-        if isinstance(other, Vector2):
+        if other.__class__ is Vector2 or isinstance(other, Vector2):
             return Vector2(self.x + other.x, self.y + other.y)
         elif isinstance(other, (int, float)):
             return Vector2(self.x + other, self.y + other)
@@ -340,7 +1495,7 @@ class Vector2:
 
     # Subtraction
     def __sub__(self, other):
-        if isinstance(other, Vector2):
+        if other.__class__ is Vector2 or isinstance(other, Vector2):
             return Vector2(self.x - other.x, self.y - other.y)
         elif isinstance(other, (int, float)):
             return Vector2(self.x - other, self.y - other)
@@ -348,7 +1503,9 @@ class Vector2:
 
     # Multiplication
     def __mul__(self, other):
-        if isinstance(other, Vector2):
+        if other.__class__ is float or other.__class__ is int:
+            return Vector2(self.x * other, self.y * other)
+        elif isinstance(other, Vector2):
             return Vector2(self.x * other.x, self.y * other.y)
         elif isinstance(other, (int, float)):
             return Vector2(self.x * other, self.y * other)
@@ -364,6 +1521,57 @@ class Vector2:
             return Vector2(0, 0)
         return NotImplemented
 
+    # In-place addition (modifies this vector instead of creating a new one)
+    def __iadd__(self, other):
+        if other.__class__ is Vector2 or isinstance(other, Vector2):
+            self.x += other.x
+            self.y += other.y
+        elif isinstance(other, (int, float)):
+            self.x += other
+            self.y += other
+        else:
+            return NotImplemented
+        return self
+
+    # In-place subtraction
+    def __isub__(self, other):
+        if other.__class__ is Vector2 or isinstance(other, Vector2):
+            self.x -= other.x
+            self.y -= other.y
+        elif isinstance(other, (int, float)):
+            self.x -= other
+            self.y -= other
+        else:
+            return NotImplemented
+        return self
+
+    # In-place multiplication
+    def __imul__(self, other):
+        if other.__class__ is float or other.__class__ is int or isinstance(other, (int, float)):
+            self.x *= other
+            self.y *= other
+        elif isinstance(other, Vector2):
+            self.x *= other.x
+            self.y *= other.y
+        else:
+            return NotImplemented
+        return self
+
+    # In-place division
+    def __itruediv__(self, other):
+        if isinstance(other, Vector2):
+            self.x = (self.x / other.x) if other.x != 0 else 0
+            self.y = (self.y / other.y) if other.y != 0 else 0
+        elif isinstance(other, (int, float)):
+            if other != 0:
+                self.x /= other
+                self.y /= other
+            else:
+                self.x = self.y = 0
+        else:
+            return NotImplemented
+        return self
+
     # Negation (unary minus)
     def __neg__(self):
         return Vector2(-self.x, -self.y)
@@ -376,11 +1584,43 @@ class Vector2:
 
 
 class Vector3:
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x=0, y=0, z=0):
         self.x = x
         self.y = y
         self.z = z
 
+    def set(self, x, y, z):
+        """
+        Sets all components in place and returns the vector.
+        """
+        self.x = x
+        self.y = y
+        self.z = z
+        return self
+
+    def copy_from(self, other):
+        """
+        Copies the components of another vector into this one.
+        """
+        self.x = other.x
+        self.y = other.y
+        self.z = other.z
+        return self
+
+    def copy(self):
+        return Vector3(self.x, self.y, self.z)
+
+    def add_scaled(self, other, factor):
+        """
+        Adds other * factor to this vector in place.
+        """
+        self.x += other.x * factor
+        self.y += other.y * factor
+        self.z += other.z * factor
+        return self
+
     @staticmethod
     def random(min, max):
         x = random_float(min.x, max.x)
@@ -395,129 +1635,1036 @@ class Vector3:
         """
         return math.sqrt(self.x**2 + self.y**2 + self.z**2)
 
-    def normalize(self):
-        """
-        Normalizes the vector (sets its length to 1).
-        """
-        mag = self.magnitude()
-        return Vector3(self.x / mag, self.y / mag, self.z / mag)
+    def normalize(self):
+        """
+        Normalizes the vector (sets its length to 1).
+        """
+        mag = self.magnitude()
+        return Vector3(self.x / mag, self.y / mag, self.z / mag)
+
+    def dot(self, other):
+        """
+        Calculates the dot product of two vectors.
+        """
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def angle_between(self, other):
+        """
+        Calculates the angle between two vectors in radians.
+        """
+        return math.acos(self.dot(other) / (self.magnitude() * other.magnitude()))
+
+    def scale(self, factor):
+        """
+        Scales the vector by a factor.
+        """
+        return Vector3(self.x * factor, self.y * factor, self.z * factor)
+
+    def translate(self, dx, dy, dz):
+        """
+        Translates the vector by dx, dy and dz.
+        """
+        return Vector3(self.x + dx, self.y + dy, self.z + dz)
+
+    def __repr__(self):
+        return f"Vector3({self.x}, {self.y}, {self.z})"
+
+    def tup(self):
+        return self.x, self.y, self.z
+
+    # Addition
+    def __add__(self, other):
+        if other.__class__ is Vector3 or isinstance(other, Vector3):
+            return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
+        elif isinstance(other, (int, float)):
+            return Vector3(self.x + other, self.y + other, self.z + other)
+        return NotImplemented
+
+    # Subtraction
+    def __sub__(self, other):
+        if other.__class__ is Vector3 or isinstance(other, Vector3):
+            return Vector3(self.x - other.x, self.y - other.y, self.z - other.z)
+        elif isinstance(other, (int, float)):
+            return Vector3(self.x - other, self.y - other, self.z - other)
+        return NotImplemented
+
+    # Multiplication
+    def __mul__(self, other):
+        if other.__class__ is float or other.__class__ is int:
+            return Vector3(self.x * other, self.y * other, self.z * other)
+        elif isinstance(other, Vector3):
+            return Vector3(self.x * other.x, self.y * other.y, self.z * other.z)
+        elif isinstance(other, (int, float)):
+            return Vector3(self.x * other, self.y * other, self.z * other)
+        return NotImplemented
+
+    # Division
+    def __truediv__(self, other):
+        if isinstance(other, Vector3):
+            return Vector3(self.x / other.x, self.y / other.y, self.z / other.z)
+        elif isinstance(other, (int, float)):
+            return Vector3(self.x / other, self.y / other, self.z / other)
+        return NotImplemented
+
+    # In-place addition (modifies this vector instead of creating a new one)
+    def __iadd__(self, other):
+        if other.__class__ is Vector3 or isinstance(other, Vector3):
+            self.x += other.x
+            self.y += other.y
+            self.z += other.z
+        elif isinstance(other, (int, float)):
+            self.x += other
+            self.y += other
+            self.z += other
+        else:
+            return NotImplemented
+        return self
+
+    # In-place subtraction
+    def __isub__(self, other):
+        if other.__class__ is Vector3 or isinstance(other, Vector3):
+            self.x -= other.x
+            self.y -= other.y
+            self.z -= other.z
+        elif isinstance(other, (int, float)):
+            self.x -= other
+            self.y -= other
+            self.z -= other
+        else:
+            return NotImplemented
+        return self
+
+    # In-place multiplication
+    def __imul__(self, other):
+        if other.__class__ is float or other.__class__ is int or isinstance(other, (int, float)):
+            self.x *= other
+            self.y *= other
+            self.z *= other
+        elif isinstance(other, Vector3):
+            self.x *= other.x
+            self.y *= other.y
+            self.z *= other.z
+        else:
+            return NotImplemented
+        return self
+
+    # In-place division
+    def __itruediv__(self, other):
+        if isinstance(other, Vector3):
+            self.x /= other.x
+            self.y /= other.y
+            self.z /= other.z
+        elif isinstance(other, (int, float)):
+            self.x /= other
+            self.y /= other
+            self.z /= other
+        else:
+            return NotImplemented
+        return self
+
+    # Negation (unary minus)
+    def __neg__(self):
+        return Vector3(-self.x, -self.y, -self.z)
+
+    # Equality
+    def __eq__(self, other):
+        if isinstance(other, Vector3):
+            return self.x == other.x and self.y == other.y and self.z == other.z
+        return False
+
+class _VectorArray:
+    """
+    Base class for the structure-of-arrays vector containers.
+    The vectors live in one NxD float array (self.data), so every operation runs over the whole population in a single NumPy call.
+    """
+    vector = None
+    size = 0
+
+    # makes NumPy return NotImplemented for np_value * vector_array, so Python calls our reflected operators
+    # instead of NumPy looping over the container element by element
+    __array_ufunc__ = None
+
+    def __init__(self, data=None, count=0):
+        if data is None:
+            data = np.zeros((count, self.size))
+        elif not isinstance(data, np.ndarray) and len(data) and isinstance(data[0], self.vector):
+            data = [vector.tup() for vector in data]
+        self.data = np.asarray(data, dtype=float).reshape(-1, self.size)
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        return cls([vector.tup() for vector in vectors])
+
+    def to_vectors(self):
+        vector = self.vector
+        return [vector(*values) for values in self.data.tolist()]
+
+    def copy(self):
+        return type(self)(self.data.copy())
+
+    def _operand(self, other):
+        """
+        Returns other as something that broadcasts against self.data, or None if it is not supported.
+        """
+        if isinstance(other, _VectorArray):
+            return other.data
+        if isinstance(other, self.vector):
+            return np.array(other.tup(), dtype=float)
+        if isinstance(other, (int, float, np.number)):
+            return other
+        if isinstance(other, np.ndarray):
+            return other[:, None] if other.ndim == 1 and len(other) == len(self.data) else other
+        return None
+
+    def magnitude(self):
+        """
+        Returns the magnitude (length) of every vector.
+        """
+        return np.sqrt(self.sqr_magnitude())
+
+    def sqr_magnitude(self):
+        return np.einsum("ij,ij->i", self.data, self.data)
+
+    def normalize(self):
+        """
+        Normalizes every vector (sets its length to 1). Zero vectors stay zero.
+        """
+        mag = self.magnitude()[:, None]
+        return type(self)(np.divide(self.data, mag, out=np.zeros_like(self.data), where=mag != 0))
+
+    def dot(self, other):
+        """
+        Calculates the dot product of every vector with other (a vector or a vector array).
+        """
+        return (self.data * self._operand(other)).sum(axis=1)
+
+    def angle_between(self, other):
+        """
+        Calculates the angle between every vector and other in radians.
+        """
+        other_mag = other.magnitude()
+        return np.arccos(np.clip(self.dot(other) / (self.magnitude() * other_mag), -1, 1))
+
+    def scale(self, factor):
+        """
+        Scales every vector by a factor (a number or one factor per vector).
+        """
+        return self * factor
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.to_vectors())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.vector(*self.data[index].tolist())
+        return type(self)(self.data[index])
+
+    def __setitem__(self, index, value):
+        operand = self._operand(value)
+        if operand is None:
+            operand = value
+        self.data[index] = operand
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self.data)} vectors)"
+
+    # Addition
+    def __add__(self, other):
+        other = self._operand(other)
+        if other is None:
+            return NotImplemented
+        return type(self)(self.data + other)
+
+    __radd__ = __add__
+
+    # Subtraction
+    def __sub__(self, other):
+        other = self._operand(other)
+        if other is None:
+            return NotImplemented
+        return type(self)(self.data - other)
+
+    def __rsub__(self, other):
+        other = self._operand(other)
+        if other is None:
+            return NotImplemented
+        return type(self)(other - self.data)
+
+    # Multiplication
+    def __mul__(self, other):
+        other = self._operand(other)
+        if other is None:
+            return NotImplemented
+        return type(self)(self.data * other)
+
+    __rmul__ = __mul__
+
+    # Division (like Vector2, dividing by zero gives 0)
+    def __truediv__(self, other):
+        other = self._operand(other)
+        if other is None:
+            return NotImplemented
+        other = np.broadcast_to(other, self.data.shape)
+        return type(self)(np.divide(self.data, other, out=np.zeros_like(self.data), where=other != 0))
+
+    def __rtruediv__(self, other):
+        other = self._operand(other)
+        if other is None:
+            return NotImplemented
+        other = np.broadcast_to(other, self.data.shape)
+        return type(self)(np.divide(other, self.data, out=np.zeros_like(self.data), where=self.data != 0))
+
+    # Negation (unary minus)
+    def __neg__(self):
+        return type(self)(-self.data)
+
+
+class Vector2Array(_VectorArray):
+    """
+    Array of Vector2 stored as an Nx2 float array.
+    """
+    vector = Vector2
+    size = 2
+
+    @staticmethod
+    def random(count, min, max):
+        return Vector2Array(np.random.uniform((min.x, min.y), (max.x, max.y), (count, 2)))
+
+    @staticmethod
+    def random_polar(count, theta_min=0, theta_max=math.tau, r_min=1, r_max=1):
+        theta = np.random.uniform(theta_min, theta_max, count)
+        r = np.random.uniform(r_min, r_max, count)
+
+        return Vector2Array(np.column_stack((r * np.cos(theta), r * np.sin(theta))))
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @x.setter
+    def x(self, value):
+        self.data[:, 0] = value
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @y.setter
+    def y(self, value):
+        self.data[:, 1] = value
+
+    def cross(self, other):
+        """
+        Calculates the scalar cross product of every vector with other.
+        """
+        other = np.broadcast_to(self._operand(other), self.data.shape)
+        return self.data[:, 0] * other[:, 1] - self.data[:, 1] * other[:, 0]
+
+    def rotate(self, angle):
+        """
+        Rotates every vector by a given angle in degrees (a number or one angle per vector).
+        """
+        rad = np.radians(angle)
+        cos_theta, sin_theta = np.cos(rad), np.sin(rad)
+        x, y = self.data[:, 0], self.data[:, 1]
+        return Vector2Array(np.column_stack((x * cos_theta - y * sin_theta, x * sin_theta + y * cos_theta)))
+
+    def translate(self, dx, dy):
+        """
+        Translates every vector by dx and dy.
+        """
+        return Vector2Array(self.data + (dx, dy))
+
+
+class Vector3Array(_VectorArray):
+    """
+    Array of Vector3 stored as an Nx3 float array.
+    """
+    vector = Vector3
+    size = 3
+
+    @staticmethod
+    def random(count, min, max):
+        return Vector3Array(np.random.uniform((min.x, min.y, min.z), (max.x, max.y, max.z), (count, 3)))
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @x.setter
+    def x(self, value):
+        self.data[:, 0] = value
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @y.setter
+    def y(self, value):
+        self.data[:, 1] = value
+
+    @property
+    def z(self):
+        return self.data[:, 2]
+
+    @z.setter
+    def z(self, value):
+        self.data[:, 2] = value
+
+    def cross(self, other):
+        """
+        Calculates the cross product of every vector with other.
+        """
+        return Vector3Array(np.cross(self.data, np.broadcast_to(self._operand(other), self.data.shape)))
+
+    def rotate_x(self, angle):
+        """
+        Rotates every vector around the x axis by a given angle in degrees.
+        """
+        rad = np.radians(angle)
+        cos_theta, sin_theta = np.cos(rad), np.sin(rad)
+        x, y, z = self.data.T
+        return Vector3Array(np.column_stack((x, y * cos_theta - z * sin_theta, y * sin_theta + z * cos_theta)))
+
+    def rotate_y(self, angle):
+        """
+        Rotates every vector around the y axis by a given angle in degrees.
+        """
+        rad = np.radians(angle)
+        cos_theta, sin_theta = np.cos(rad), np.sin(rad)
+        x, y, z = self.data.T
+        return Vector3Array(np.column_stack((x * cos_theta + z * sin_theta, y, -x * sin_theta + z * cos_theta)))
+
+    def rotate_z(self, angle):
+        """
+        Rotates every vector around the z axis by a given angle in degrees.
+        """
+        rad = np.radians(angle)
+        cos_theta, sin_theta = np.cos(rad), np.sin(rad)
+        x, y, z = self.data.T
+        return Vector3Array(np.column_stack((x * cos_theta - y * sin_theta, x * sin_theta + y * cos_theta, z)))
+
+    def translate(self, dx, dy, dz):
+        """
+        Translates every vector by dx, dy and dz.
+        """
+        return Vector3Array(self.data + (dx, dy, dz))
+
+
+def wpp(point: Vector3, focal_length) -> Vector2:
+    """
+    Weak Perspective Projection
+
+    Formula:
+    x_proj = (focal_length * x) / (focal_length + z)
+    y_proj = (focal_length * y) / (focal_length + z)
+    """
+
+    projected = Vector2()
+
+    projected.x = (focal_length * point.x) / (focal_length + point.z)
+    projected.y = (focal_length * point.y) / (focal_length + point.z)
+
+    return projected
+
+def rotate_x(point: Vector3, angle: float):
+    angle_rad = math.radians(angle)
+    return Vector3(
+        point.x,
+        point.y * math.cos(angle_rad) - point.z * math.sin(angle_rad),
+        point.y * math.sin(angle_rad) + point.z * math.cos(angle_rad)
+    )
+
+def rotate_y(point: Vector3, angle: float):
+    angle_rad = math.radians(angle)
+    return Vector3(
+        point.x * math.cos(angle_rad) + point.z * math.sin(angle_rad),
+        point.y,
+        -point.x * math.sin(angle_rad) + point.z * math.cos(angle_rad)
+    )
+
+def rotate_z(point: Vector3, angle: float):
+    angle_rad = math.radians(angle)
+    return Vector3(
+        point.x * math.cos(angle_rad) - point.y * math.sin(angle_rad),
+        point.x * math.sin(angle_rad) + point.y * math.cos(angle_rad),
+        point.z
+    )
+
+
+def rotation_matrix(angle_x=0, angle_y=0, angle_z=0):
+    """
+    Returns the 3x3 matrix that does rotate_x, then rotate_y, then rotate_z (angles in degrees) in one multiplication.
+    """
+    rx, ry, rz = math.radians(angle_x), math.radians(angle_y), math.radians(angle_z)
+    cx, sx = math.cos(rx), math.sin(rx)
+    cy, sy = math.cos(ry), math.sin(ry)
+    cz, sz = math.cos(rz), math.sin(rz)
+
+    matrix_x = np.array(((1, 0, 0), (0, cx, -sx), (0, sx, cx)))
+    matrix_y = np.array(((cy, 0, sy), (0, 1, 0), (-sy, 0, cy)))
+    matrix_z = np.array(((cz, -sz, 0), (sz, cz, 0), (0, 0, 1)))
+
+    return matrix_z @ matrix_y @ matrix_x
+
+
+def project_points(points, focal_length, out=None):
+    """
+    Weak perspective projection (like wpp) of an Nx3 array of points, returns an Nx2 array.
+    Points at depth 0 (z = -focal_length) come out as inf / nan without a warning, cull them by depth first (see Mesh).
+    """
+    points = _as_array(points, 3)
+    if out is None:
+        out = np.empty((len(points), 2))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = focal_length / (focal_length + points[:, 2])
+        np.multiply(points[:, :2], factor[:, None], out=out)
+    return out
+
+
+class Mesh:
+    """
+    3D mesh for batched wireframe and polygon drawing.
+    vertices is an Nx3 array (or list of Vector3), edges an Mx2 array of vertex indices and faces an MxK array of vertex indices
+    (all faces need the same number of vertices, e.g. triangles or quads), counter clockwise when seen from the camera.
+
+    The camera sits at z = -focal_length looking towards +z, like wpp. With static=True the projected vertices are cached
+    and only recomputed when the rotation, position or focal length change. The arrays transform() returns are read only
+    and never change afterwards, a new transform gets new arrays.
+    """
+    def __init__(self, vertices, edges=None, faces=None, static=False):
+        self.vertices = _as_array([vertex.tup() for vertex in vertices] if len(vertices) and isinstance(vertices[0], Vector3) else vertices, 3)
+        self.edges = np.asarray(edges if edges is not None else (), dtype=np.int64).reshape(-1, 2)
+        self.faces = np.asarray(faces, dtype=np.int64) if faces is not None else None
+        self.static = static
+
+        self.cache_key = None
+        self.projected = None
+        self.depth = None
+
+    def transform(self, rotation=(0, 0, 0), position=None, focal_length=400):
+        """
+        Rotates (angles in degrees around x, y and z), translates and projects all vertices.
+        Returns (projected Nx2 array, depth array) where depth is the distance in front of the camera (focal_length + z).
+        """
+        offset = position.tup() if position is not None else (0, 0, 0)
+        key = (tuple(rotation), offset, focal_length)
+        if self.static and key == self.cache_key:
+            return self.projected, self.depth
+
+        points = self.vertices @ rotation_matrix(*rotation).T
+        points += offset
+
+        self.depth = focal_length + points[:, 2]
+        self.projected = project_points(points, focal_length)
+        self.depth.flags.writeable = False
+        self.projected.flags.writeable = False
+        self.cache_key = key
+
+        return self.projected, self.depth
+
+    def draw_wireframe(self, surface, color, rotation=(0, 0, 0), position=None, focal_length=400, width=1, near=1.0):
+        """
+        Draws all edges whose two vertices are in front of the near plane with one draw_lines call.
+        """
+        projected, depth = self.transform(rotation, position, focal_length)
+        edges = self.edges[(depth[self.edges] > near).all(axis=1)]
+
+        draw_lines(surface, color, projected[edges[:, 0]], projected[edges[:, 1]], width)
+
+    def draw_faces(self, surface, colors, rotation=(0, 0, 0), position=None, focal_length=400, width=0, near=1.0, backface_culling=True):
+        """
+        Draws the faces with one draw_polygons call, far faces first.
+        colors is one Color for all faces or one color per face. Faces that cross the near plane are skipped,
+        and with backface_culling faces that are clockwise on screen (facing away) are skipped too.
+        """
+        if self.faces is None:
+            raise ValueError("This mesh has no faces, create it with faces=... or use draw_wireframe")
+
+        projected, depth = self.transform(rotation, position, focal_length)
+        faces = self.faces
+        # near plane first, so faces with vertices behind the camera (inf / nan positions) never reach the math below
+        indices = np.flatnonzero((depth[faces] > near).all(axis=1))
+
+        polygons = projected[faces[indices]]
+        if backface_culling:
+            x, y = polygons[:, :, 0], polygons[:, :, 1]
+            front = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1) > 0
+            indices, polygons = indices[front], polygons[front]
+
+        order = np.argsort(-depth[faces[indices]].mean(axis=1), kind="stable")
+        indices, polygons = indices[order], polygons[order]
+
+        if not isinstance(colors, (Color, tuple)):
+            colors = [colors[index] for index in indices.tolist()]
+
+        draw_polygons(surface, colors, polygons, width)
+
+
+class PixelBuffer:
+    """
+    Direct access to the pixels of a surface (the window by default) as a writable (width, height, 3) NumPy array,
+    with helpers that use the library's centered coordinates (x to the right, y up, 0, 0 in the middle).
+    The surface is locked once when the buffer is opened and unlocked when it is closed, so use it once per frame:
+
+    with PixelBuffer() as pixels:
+        pixels.apply(lambda x, y: (x % 256, y % 256, 0))
+    """
+    def __init__(self, surface=None):
+        self.surface = surface
+        self.pixels = None
+        self.grid = None
+        self.grid_key = None
+
+    def open(self):
+        if self.surface is None:
+            self.surface = window.SURFACE
+        self.pixels = pygame.surfarray.pixels3d(self.surface)
+        return self
+
+    def close(self):
+        # dropping the array view unlocks the surface
+        self.pixels = None
+        _track(self.surface, self.surface.get_rect())
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def coordinates(self):
+        """
+        Returns (x, y) arrays of shape (width, height) with the world coordinates of every pixel (cached until the camera moves).
+        """
+        camera = window.camera
+        width, height = self.pixels.shape[:2]
+        key = (width, height, camera.offset_x, camera.offset_y, camera.factor)
+        if self.grid is None or self.grid_key != key:
+            xs = (np.arange(width) - camera.offset_x) / camera.factor
+            ys = (camera.offset_y - np.arange(height)) / camera.factor
+            self.grid = np.meshgrid(xs, ys, indexing="ij")
+            self.grid_key = key
+        return self.grid
+
+    def fill(self, color):
+        self.pixels[...] = color.tup() if isinstance(color, Color) else color
+
+    def _indices(self, points):
+        screen = _screen_points(points)
+        width, height = self.pixels.shape[:2]
+        inside = (screen[:, 0] >= 0) & (screen[:, 0] < width) & (screen[:, 1] >= 0) & (screen[:, 1] < height)
+        return screen[:, 0], screen[:, 1], inside
+
+    def set(self, points, colors):
+        """
+        Sets many points at once (list of Vector2, flat sequence or Nx2 array). colors is one color or an Nx3 array.
+        Points outside the surface are skipped.
+        """
+        x, y, inside = self._indices(points)
+        colors = np.asarray(colors.tup() if isinstance(colors, Color) else colors)
+        if colors.ndim == 2:
+            colors = colors[inside]
+        self.pixels[x[inside], y[inside]] = colors
+
+    def get(self, points):
+        """
+        Returns the Nx3 colors at the given points (black for points outside the surface).
+        """
+        x, y, inside = self._indices(points)
+        colors = np.zeros((len(x), 3), dtype=np.uint8)
+        colors[inside] = self.pixels[x[inside], y[inside]]
+        return colors
+
+    def blend(self, color, alpha):
+        """
+        Blends the whole surface towards color (one color or a (width, height, 3) array).
+        alpha is 0 to 1, one value or a (width, height) array.
+        """
+        color = np.asarray(color.tup() if isinstance(color, Color) else color, dtype=np.float32)
+        alpha = np.asarray(alpha, dtype=np.float32)
+        if alpha.ndim == 2:
+            alpha = alpha[:, :, None]
+
+        result = self.pixels.astype(np.float32)
+        result += (color - result) * alpha
+        self.pixels[...] = result
+
+    def apply(self, kernel):
+        """
+        Calls kernel(x, y) once with the centered coordinate arrays of all pixels.
+        It returns the new colors as a (width, height, 3) array, a tuple of three (width, height) channel arrays,
+        or a (width, height) array for gray values. Values are clipped to 0-255.
+        """
+        x, y = self.coordinates()
+        result = kernel(x, y)
+        if isinstance(result, tuple):
+            result = np.stack(np.broadcast_arrays(*result), axis=-1)
+        else:
+            result = np.asarray(result)
+            if result.ndim == 2:
+                result = result[:, :, None]
+
+        self.pixels[...] = np.clip(result, 0, 255)
+
+
+def _scale_surface(surface, scale, smooth=True):
+    if scale == 1:
+        return surface
+
+    width, height = surface.get_size()
+    size = (max(round(width * scale), 1), max(round(height * scale), 1))
+    if smooth and surface.get_bitsize() >= 24:
+        return pygame.transform.smoothscale(surface, size)
+    return pygame.transform.scale(surface, size)
+
+
+class SurfaceCache:
+    """
+    Least recently used cache of pre-rendered surfaces.
+    Evicts when it holds more than max_size surfaces or, if max_bytes is set, more than max_bytes of pixel data.
+    Counts hits and misses so you can check how well it works (cache.hits, cache.misses).
+    """
+    def __init__(self, max_size=256, max_bytes=None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.surfaces.move_to_end(key)
+        return surface
+
+    def put(self, key, surface):
+        old = self.surfaces.pop(key, None)
+        if old is not None:
+            self.bytes -= _surface_bytes(old)
+
+        self.surfaces[key] = surface
+        self.bytes += _surface_bytes(surface)
+
+        while len(self.surfaces) > 1 and (len(self.surfaces) > self.max_size or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            _, evicted = self.surfaces.popitem(last=False)
+            self.bytes -= _surface_bytes(evicted)
+
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+
+def _surface_bytes(surface):
+    width, height = surface.get_size()
+    return width * height * surface.get_bytesize()
+
+
+# Shared cache of rendered text, used by Text and Button
+text_cache = SurfaceCache(256)
+
+# Shared cache of pre-rendered translucent circles, used by draw_circle_2 and draw_circles_2
+circle_cache = SurfaceCache(4096, max_bytes=32 * 1024 * 1024)
+
+# Shared cache of resized sprites, used by Sprite.scaled (so the draw functions follow the camera zoom)
+sprite_cache = SurfaceCache(1024, max_bytes=32 * 1024 * 1024)
+
+
+def circle_sprite(radius, color):
+    """
+    Returns a cached SRCALPHA surface of size (2 * radius, 2 * radius) with a circle of the given RGBA color.
+    """
+    key = (radius, color)
+    sprite = circle_cache.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        circle_cache.put(key, sprite)
+
+    return sprite
+
+
+class ParticleSystem:
+    """
+    Fixed capacity particle pool stored in NumPy arrays, so emitting and killing particles never allocates.
+    The live particles are always the first `count` slots; dead ones are compacted away in update().
+
+    Color (RGBA) and size are interpolated from their start to their end values over each particle's lifetime.
+    The lifetime is split into `steps` steps, so drawing only needs that many different circle sprites (from circle_cache)
+    and all particles are drawn with one Surface.blits call.
+    """
+    def __init__(self, capacity=10000, start_color=(255, 255, 255, 255), end_color=(255, 255, 255, 0), start_size=4, end_size=1, gravity=None, drag=0.0, steps=32):
+        self.capacity = capacity
+        self.count = 0
+        self.gravity = gravity if gravity is not None else Vector2()
+        self.drag = drag
+
+        self.positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.ages = np.zeros(capacity)
+        self.lifetimes = np.ones(capacity)
+
+        self.steps = steps
+        t = np.linspace(0, 1, steps)[:, None]
+        start_color = np.array(start_color.tup() + (255,) if isinstance(start_color, Color) else start_color, dtype=float)
+        end_color = np.array(end_color.tup() + (255,) if isinstance(end_color, Color) else end_color, dtype=float)
+        self.color_steps = [tuple(color) for color in np.rint(start_color + (end_color - start_color) * t).astype(int).tolist()]
+        self.size_steps = np.rint(start_size + (end_size - start_size) * t[:, 0]).astype(int).tolist()
+
+    def emit(self, count, position, speed_min=0, speed_max=100, angle_min=0, angle_max=math.tau, lifetime_min=1, lifetime_max=1):
+        """
+        Emits up to count particles at position, moving in random directions between angle_min and angle_max (radians).
+        Returns how many particles were emitted (less than count when the pool is full).
+        """
+        count = min(count, self.capacity - self.count)
+        if count <= 0:
+            return 0
+
+        new = slice(self.count, self.count + count)
+        theta = np.random.uniform(angle_min, angle_max, count)
+        speed = np.random.uniform(speed_min, speed_max, count)
+
+        self.positions[new] = (position.x, position.y)
+        self.velocities[new, 0] = speed * np.cos(theta)
+        self.velocities[new, 1] = speed * np.sin(theta)
+        self.ages[new] = 0
+        self.lifetimes[new] = np.random.uniform(lifetime_min, lifetime_max, count)
+        self.count += count
+
+        return count
+
+    def update(self, dt):
+        """
+        Ages, removes and moves all live particles.
+        """
+        count = self.count
+        ages = self.ages[:count]
+        ages += dt
+
+        alive = ages < self.lifetimes[:count]
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            count = self.count = len(keep)
+            for values in (self.positions, self.velocities, self.ages, self.lifetimes):
+                values[:count] = values[keep]
+
+        velocities = self.velocities[:count]
+        if self.gravity.x or self.gravity.y:
+            velocities += (self.gravity.x * dt, self.gravity.y * dt)
+        if self.drag:
+            velocities *= max(0.0, 1 - self.drag * dt)
+
+        self.positions[:count] += velocities * dt
+
+    def clear(self):
+        self.count = 0
+
+    def draw(self, surface):
+        count = self.count
+        if count == 0:
+            return
+
+        camera = window.camera
+        size_steps = [int(size * camera.factor) for size in self.size_steps]
+
+        step = np.minimum((self.ages[:count] / self.lifetimes[:count] * self.steps).astype(np.int64), self.steps - 1)
+        sizes = np.array(size_steps)[step]
+
+        corners = camera.to_screen_array(self.positions[:count])
+        corners -= sizes[:, None]
+        visible = (sizes > 0) & camera.visible_array(corners[:, 0], corners[:, 1], corners[:, 0] + 2 * sizes, corners[:, 1] + 2 * sizes)
+
+        sprites = np.empty(self.steps, dtype=object)
+        sprites[:] = [circle_sprite(size, color) if size > 0 else None for size, color in zip(size_steps, self.color_steps)]
+        blit_sequence = zip(sprites[step[visible]].tolist(), corners[visible].tolist())
+
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            _track_all(surface, surface.blits(blit_sequence))
+        else:
+            surface.blits(blit_sequence, False)
+
+
+class Sprite:
+    """
+    An image, or a region (area) of a bigger image such as a TextureAtlas page.
+    Use Sprite.load / Sprite.from_surface to convert the image to the display format once.
+    """
+    def __init__(self, surface, area=None):
+        self.surface = surface
+        self.area = pygame.Rect(area) if area is not None else surface.get_rect()
+        self.width = self.area.width
+        self.height = self.area.height
+
+    @staticmethod
+    def from_surface(surface):
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        return Sprite(surface)
 
-    def dot(self, other):
-        """
-        Calculates the dot product of two vectors.
-        """
-        return self.x * other.x + self.y * other.y + self.z * other.z
+    @staticmethod
+    def load(path):
+        return Sprite.from_surface(pygame.image.load(path))
 
-    def angle_between(self, other):
+    def scaled(self, scale):
         """
-        Calculates the angle between two vectors in radians.
+        Returns a copy of the sprite resized by scale, 1 returns the sprite itself.
+        The copies are kept in sprite_cache by pixel size, so a smooth zoom only resizes when the size actually changes.
+        The draw functions use it with camera.factor, so sprites zoom along with the shapes.
         """
-        return math.acos(self.dot(other) / (self.magnitude() * other.magnitude()))
+        if scale == 1:
+            return self
+
+        size = (max(round(self.width * scale), 1), max(round(self.height * scale), 1))
+        key = (self, size)
+        surface = sprite_cache.get(key)
+        if surface is None:
+            surface = sprite_cache.put(key, _scale_surface(self.surface.subsurface(self.area), scale))
+        return Sprite(surface)
+
+    def draw(self, surface, position):
+        # draws the sprite centered on position (scaled by the camera zoom), for many sprites use a SpriteBatch
+        camera = window.camera
+        sprite = self.scaled(camera.factor)
+        x, y = camera.to_screen(position.x, position.y)
+        x, y = x - sprite.width // 2, y - sprite.height // 2
+        if camera.visible(x, y, x + sprite.width, y + sprite.height):
+            rect = surface.blit(sprite.surface, (x, y), sprite.area)
+            if window.dirty_rects_enabled and surface is window.SURFACE:
+                window.dirty_rects.append(rect)
+
+
+class TextureAtlas:
+    """
+    Packs many small images into one surface (shelf packing), so a SpriteBatch can draw them all from the same source.
+    add() returns a Sprite that points into the atlas.
+    """
+    def __init__(self, width=1024, height=1024, padding=1):
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha()
+        self.padding = padding
+        self.sprites = {}
 
-    def scale(self, factor):
-        """
-        Scales the vector by a factor.
-        """
-        return Vector3(self.x * factor, self.y * factor, self.z * factor)
+        self.x = 0
+        self.y = 0
+        self.shelf_height = 0
 
-    def translate(self, dx, dy, dz):
-        """
-        Translates the vector by dx, dy and dz.
-        """
-        return Vector3(self.x + dx, self.y + dy, self.z + dz)
+    def add(self, image, name=None):
+        width, height = image.get_size()
+        atlas_width, atlas_height = self.surface.get_size()
 
-    def __repr__(self):
-        return f"Vector3({self.x}, {self.y}, {self.z})"
+        if self.x + width > atlas_width:
+            self.x = 0
+            self.y += self.shelf_height + self.padding
+            self.shelf_height = 0
 
-    def tup(self):
-        return self.x, self.y, self.z
+        if width > atlas_width or self.y + height > atlas_height:
+            raise ValueError(f"Image of size {width}x{height} doesn't fit in the texture atlas anymore")
 
-    # Addition
-    def __add__(self, other):
-        if isinstance(other, Vector3):
-            return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
-        elif isinstance(other, (int, float)):
-            return Vector3(self.x + other, self.y + other, self.z + other)
-        return NotImplemented
+        self.surface.blit(image, (self.x, self.y))
+        sprite = Sprite(self.surface, (self.x, self.y, width, height))
 
-    # Subtraction
-    def __sub__(self, other):
-        if isinstance(other, Vector3):
-            return Vector3(self.x - other.x, self.y - other.y, self.z - other.z)
-        elif isinstance(other, (int, float)):
-            return Vector3(self.x - other, self.y - other, self.z - other)
-        return NotImplemented
+        self.x += width + self.padding
+        self.shelf_height = max(self.shelf_height, height)
 
-    # Multiplication
-    def __mul__(self, other):
-        if isinstance(other, Vector3):
-            return Vector3(self.x * other.x, self.y * other.y, self.z * other.z)
-        elif isinstance(other, (int, float)):
-            return Vector3(self.x * other, self.y * other, self.z * other)
-        return NotImplemented
+        if name is not None:
+            self.sprites[name] = sprite
+        return sprite
 
-    # Division
-    def __truediv__(self, other):
-        if isinstance(other, Vector3):
-            return Vector3(self.x / other.x, self.y / other.y, self.z / other.z)
-        elif isinstance(other, (int, float)):
-            return Vector3(self.x / other, self.y / other, self.z / other)
-        return NotImplemented
+    def load(self, path, name=None):
+        return self.add(pygame.image.load(path), path if name is None else name)
 
-    # Negation (unary minus)
-    def __neg__(self):
-        return Vector3(-self.x, -self.y, -self.z)
+    def __getitem__(self, name):
+        return self.sprites[name]
 
-    # Equality
-    def __eq__(self, other):
-        if isinstance(other, Vector3):
-            return self.x == other.x and self.y == other.y and self.z == other.z
-        return False
 
-def wpp(point: Vector3, focal_length) -> Vector2:
+class SpriteBatch:
     """
-    Weak Perspective Projection
-
-    Formula:
-    x_proj = (focal_length * x) / (focal_length + z)
-    y_proj = (focal_length * y) / (focal_length + z)
+    Collects sprite draws during update() and submits them with one Surface.blits call in flush().
+    Sprites are drawn centered on their position and scaled by the camera zoom, lower layers first (draws within a layer keep their order).
     """
+    def __init__(self, sort_by_layer=True):
+        self.sort_by_layer = sort_by_layer
+        self.commands = []
+
+    def draw(self, sprite, position, layer=0):
+        camera = window.camera
+        sprite = sprite.scaled(camera.factor)
+        x, y = camera.to_screen(position.x, position.y)
+        x, y = x - sprite.width // 2, y - sprite.height // 2
+        if camera.visible(x, y, x + sprite.width, y + sprite.height):
+            self.commands.append((layer, (sprite.surface, (x, y), sprite.area)))
+
+    def draw_many(self, sprite, positions, layer=0):
+        """
+        Queues the same sprite at many positions (list of Vector2, flat sequence or Nx2 array) with one coordinate transform.
+        """
+        sprite = sprite.scaled(window.camera.factor)
+        corners = _screen_points(positions)
+        corners -= (sprite.width // 2, sprite.height // 2)
+        corners = corners[window.camera.visible_array(corners[:, 0], corners[:, 1], corners[:, 0] + sprite.width, corners[:, 1] + sprite.height)]
+        source, area = sprite.surface, sprite.area
+        self.commands.extend([(layer, (source, corner, area)) for corner in corners.tolist()])
 
-    projected = Vector2()
+    def clear(self):
+        self.commands.clear()
 
-    projected.x = (focal_length * point.x) / (focal_length + point.z)
-    projected.y = (focal_length * point.y) / (focal_length + point.z)
+    def flush(self, surface=None):
+        """
+        Draws all queued sprites onto surface (the window by default) and empties the batch.
+        """
+        if surface is None:
+            surface = window.SURFACE
 
-    return projected
+        commands = self.commands
+        if self.sort_by_layer:
+            commands.sort(key=lambda command: command[0])
 
-def rotate_x(point: Vector3, angle: float):
-    angle_rad = math.radians(angle)
-    return Vector3(
-        point.x,
-        point.y * math.cos(angle_rad) - point.z * math.sin(angle_rad),
-        point.y * math.sin(angle_rad) + point.z * math.cos(angle_rad)
-    )
+        blit_sequence = [command[1] for command in commands]
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            _track_all(surface, surface.blits(blit_sequence))
+        else:
+            surface.blits(blit_sequence, False)
 
-def rotate_y(point: Vector3, angle: float):
-    angle_rad = math.radians(angle)
-    return Vector3(
-        point.x * math.cos(angle_rad) + point.z * math.sin(angle_rad),
-        point.y,
-        -point.x * math.sin(angle_rad) + point.z * math.cos(angle_rad)
-    )
+        self.commands = []
 
-def rotate_z(point: Vector3, angle: float):
-    angle_rad = math.radians(angle)
-    return Vector3(
-        point.x * math.cos(angle_rad) - point.y * math.sin(angle_rad),
-        point.x * math.sin(angle_rad) + point.y * math.cos(angle_rad),
-        point.z
-    )
+
+def render_text(font, text, anti_aliasing, color, bg_color=None, cache=text_cache, scale=1.0):
+    """
+    Same as font.render, but returns a cached surface if the same text was rendered before with the same font and colors.
+    scale resizes the text (Text uses the window's render scale, so text keeps its size on the display).
+    """
+    color = color.tup() if isinstance(color, Color) else color
+    bg_color = bg_color.tup() if isinstance(bg_color, Color) else bg_color
+    key = (text, font, color, bg_color, anti_aliasing, scale)
+
+    surface = cache.get(key)
+    if surface is None:
+        surface = cache.put(key, _scale_surface(font.render(text, anti_aliasing, color, bg_color), scale))
+
+    return surface
 
 
 class Text:
-    def __init__(self, text, font, position, anchor, color, bg_color=None, anti_aliasing=True):
-        """Default anchor is top left"""
+    def __init__(self, text, font, position, anchor, color, bg_color=None, anti_aliasing=True, cache=True):
+        """Default anchor is top left\nWith cache=True the rendered surface is reused as long as text, font and colors stay the same"""
 
         self.text = text
         self.font = font
@@ -526,6 +2673,7 @@ class Text:
         self.color = color
         self.bg_color = bg_color
         self.anti_aliasing = anti_aliasing
+        self.cache = cache
 
     center = "center"
     top_left = "topleft"
@@ -533,15 +2681,22 @@ class Text:
     bottom_left = "bottomleft"
     bottom_right = "bottomright"
 
-    arial_32 = pygame.font.SysFont("Arial", 32)
-    arial_24 = pygame.font.SysFont("Arial", 24)
-    arial_16 = pygame.font.SysFont("Arial", 16)
-
-    def render(self):
-        text = self.font.render(self.text, self.anti_aliasing, self.color.tup(), self.bg_color.tup() if self.bg_color != None else None)
+    # loaded on first use
+    arial_32 = _LazyFont("Arial", 32)
+    arial_24 = _LazyFont("Arial", 24)
+    arial_16 = _LazyFont("Arial", 16)
+
+    def render(self, surface=None):
+        """Draws on the window, or on surface (a Layer's surface for example)"""
+        surface = surface if surface is not None else window.SURFACE
+        scale = window.camera.scale
+        if self.cache:
+            text = render_text(self.font, self.text, self.anti_aliasing, self.color, self.bg_color, scale=scale)
+        else:
+            text = _scale_surface(self.font.render(self.text, self.anti_aliasing, self.color.tup(), self.bg_color.tup() if self.bg_color != None else None), scale)
         text_rect = text.get_rect()
 
-        position = self.position.x + window.WIDTH // 2, -self.position.y + window.HEIGHT // 2
+        position = window.camera.to_screen(self.position.x, self.position.y)
 
         if self.anchor == Text.center:
             text_rect.center = position
@@ -554,7 +2709,7 @@ class Text:
         if self.anchor == Text.bottom_right:
             text_rect.bottomright = position
 
-        window.SURFACE.blit(text, text_rect)
+        _track(surface, surface.blit(text, text_rect))
 
 
 class Button:
@@ -573,16 +2728,25 @@ class Button:
         self.outline_width = outline_width
         self.clicked = False
         self.clicked_this_click = False
+        self.text_obj = None
 
-    def render(self):
-        draw_rectangle(window.SURFACE, self.color, self.position, self.scale)
+    def render(self, surface=None):
+        """Draws on the window, or on surface (a Layer's surface for example)"""
+        surface = surface if surface is not None else window.SURFACE
+        draw_rectangle(surface, self.color, self.position, self.scale)
 
         if self.enable_outline:
-            draw_rectangle(window.SURFACE, self.outline_color, self.position, self.scale, self.outline_width)
+            draw_rectangle(surface, self.outline_color, self.position, self.scale, self.outline_width)
 
         if self.render_text:
-            self.text_obj = Text(self.text, self.font, self.position, Text.center, self.text_color)
-            self.text_obj.render()
+            if self.text_obj is None:
+                self.text_obj = Text(self.text, self.font, self.position, Text.center, self.text_color)
+            else:
+                self.text_obj.text = self.text
+                self.text_obj.font = self.font
+                self.text_obj.position = self.position
+                self.text_obj.color = self.text_color
+            self.text_obj.render(surface)
 
     def listen(self) -> tuple[bool, bool, bool]:
         """Returns tuple with three parameters:\n1. hovering (is true when mouse is above)\n2. clicking (is true while clicking)\n3. clicked (is true for one frame when clicked)"""
@@ -610,12 +2774,257 @@ class Button:
         return hovering, clicking, self.clicked
 
 
+class UI:
+    """
+    Retained mode container for many Buttons.
+    Every button is pre-rendered once per state (normal, hover, pressed) into a cached surface, and hover/click tests go
+    through a SpatialHash of the button rectangles using the shared input_manager state, so only the button under the cursor is checked.
+    Call update() once per frame after input_manager.update() and render() to draw all buttons with one Surface.blits call.
+    If you change a button (text, colors, position, ...) call refresh(button).
+    Buttons are placed like draw_rectangle with the default camera, panning or zooming window.camera doesn't move them.
+    Their rectangles are in display pixels; with a render scale the cached surfaces are resized when drawn.
+    """
+    normal = "normal"
+    hover = "hover"
+    pressed = "pressed"
+
+    def __init__(self, cell_size=64, hover_tint=0.85, pressed_tint=0.7):
+        self.buttons = {}
+        self.order = []
+        self.index = SpatialHash(cell_size)
+        self.hover_tint = hover_tint
+        self.pressed_tint = pressed_tint
+
+        self.hovered = None
+        self.mouse_was_held = False
+        self.added = 0
+
+    def add(self, button):
+        self.added += 1
+        self.buttons[id(button)] = {"button": button, "order": self.added, "rect": None, "surfaces": None, "scaled": {}, "state": UI.normal, "hovering": False, "clicking": False, "clicked": False}
+        self.order.append(button)
+        self.refresh(button)
+        return button
+
+    def remove(self, button):
+        self.index.remove(id(button))
+        del self.buttons[id(button)]
+        self.order.remove(button)
+        if self.hovered is button:
+            self.hovered = None
+
+    def refresh(self, button):
+        """
+        Re-renders the cached surfaces of a button and moves it in the spatial index.
+        """
+        entry = self.buttons[id(button)]
+        # same placement as draw_rectangle: position is the top left corner
+        rect = pygame.Rect(button.position.x + window.WIDTH // 2, -button.position.y + window.HEIGHT // 2, button.scale.x, button.scale.y)
+        entry["rect"] = rect
+        entry["surfaces"] = {
+            UI.normal: self.render_button(button, button.color),
+            UI.hover: self.render_button(button, button.color.blend(WHITE, self.hover_tint)),
+            UI.pressed: self.render_button(button, button.color.blend(BLACK, self.pressed_tint)),
+        }
+        entry["scaled"] = {}
+        self.index.insert(id(button), rect.left, rect.top, rect.right, rect.bottom)
+
+    def render_button(self, button, color):
+        size = (max(int(button.scale.x), 1), max(int(button.scale.y), 1))
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        surface.fill(color.tup())
+
+        if button.enable_outline:
+            pygame.draw.rect(surface, button.outline_color.tup(), surface.get_rect(), button.outline_width)
+
+        if button.render_text:
+            label = render_text(button.font, button.text, True, button.text_color)
+            surface.blit(label, label.get_rect(center=surface.get_rect().center))
+
+        return surface
+
+    def update(self):
+        """
+        Updates hover and click state of the buttons from input_manager (only the previously and currently hovered buttons are touched).
+        """
+        mouse = input_manager.get_mouse_position()
+        x, y = window.camera.to_display(mouse.x, mouse.y)
+
+        # topmost (last added) button under the cursor wins
+        hits = [self.buttons[key] for key in self.index.query_point(Vector2(x, y))]
+        hovered = max(hits, key=lambda entry: entry["order"])["button"] if hits else None
+
+        held = input_manager.get_mouse_held(0)
+        pressed_now = held and not self.mouse_was_held
+        self.mouse_was_held = held
+
+        if self.hovered is not None and self.hovered is not hovered and id(self.hovered) in self.buttons:
+            entry = self.buttons[id(self.hovered)]
+            entry["hovering"] = entry["clicking"] = entry["clicked"] = False
+            entry["state"] = UI.normal
+
+        self.hovered = hovered
+        if hovered is not None:
+            entry = self.buttons[id(hovered)]
+            entry["hovering"] = True
+            entry["clicked"] = pressed_now
+            entry["clicking"] = held and (pressed_now or entry["clicking"])
+            entry["state"] = UI.pressed if entry["clicking"] else UI.hover
+
+    def listen(self, button) -> tuple[bool, bool, bool]:
+        """Same tuple as Button.listen (hovering, clicking, clicked), from the last update()"""
+        entry = self.buttons[id(button)]
+        return entry["hovering"], entry["clicking"], entry["clicked"]
+
+    def scaled(self, entry, scale):
+        # (surface, position) of a button on a surface with the given render scale, cached per state
+        key = (entry["state"], scale)
+        scaled = entry["scaled"].get(key)
+        if scaled is None:
+            rect = entry["rect"]
+            scaled = (_scale_surface(entry["surfaces"][entry["state"]], scale), (round(rect.x * scale), round(rect.y * scale)))
+            entry["scaled"][key] = scaled
+        return scaled
+
+    def render(self, surface=None):
+        if surface is None:
+            surface = window.SURFACE
+
+        scale = window.camera.scale
+        if scale == 1:
+            blit_sequence = [(entry["surfaces"][entry["state"]], entry["rect"]) for entry in (self.buttons[id(button)] for button in self.order)]
+        else:
+            blit_sequence = [self.scaled(self.buttons[id(button)], scale) for button in self.order]
+        if window.dirty_rects_enabled and surface is window.SURFACE:
+            _track_all(surface, surface.blits(blit_sequence))
+        else:
+            surface.blits(blit_sequence, False)
+
+
+def merge_rects(rects, max_rects=64):
+    """
+    Merges overlapping rectangles into their unions.
+    If there are more than max_rects after merging, returns one rectangle that covers all of them.
+    """
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        if rect.width == 0 or rect.height == 0:
+            continue
+
+        # union with every merged rectangle it touches until it touches none
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+
+    if len(merged) > max_rects:
+        return [merged[0].unionall(merged[1:])]
+
+    return merged
+
+
+class Layer:
+    """
+    Offscreen surface with the window's size that is drawn once and reused until it is invalidated.
+
+    draw(surface) is called to redraw it, with the same draw helpers, Text and Button (render(surface)) used for the screen.
+    With follow_camera=True the layer is redrawn when the camera moves or zooms, otherwise it stays fixed to the screen.
+    Transparent layers only composite the area that has something drawn on it.
+    """
+    def __init__(self, name, width, height, draw=None, order=-1, transparent=True, follow_camera=True):
+        self.name = name
+        self.draw = draw
+        self.order = order
+        self.transparent = transparent
+        self.follow_camera = follow_camera
+        self.visible = True
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA) if transparent else pygame.Surface((width, height))
+        self.rect = self.surface.get_rect()
+        self.dirty = True
+        self.camera_key = None
+
+    def invalidate(self):
+        """
+        Makes the layer redraw itself the next time it is composited.
+        """
+        self.dirty = True
+
+    def resize(self, width, height):
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA) if self.transparent else pygame.Surface((width, height))
+        self.rect = self.surface.get_rect()
+        self.dirty = True
+
+    def redraw(self):
+        self.surface.fill((0, 0, 0, 0))
+        if self.draw is not None:
+            self.draw(self.surface)
+        self.rect = self.surface.get_bounding_rect() if self.transparent else self.surface.get_rect()
+        self.dirty = False
+
+    def refresh(self, camera):
+        """
+        Redraws the layer if it was invalidated or the camera moved, returns True if it did.
+        """
+        if self.follow_camera:
+            key = (camera.offset_x, camera.offset_y, camera.factor)
+            if key != self.camera_key:
+                self.camera_key = key
+                self.dirty = True
+
+        if self.dirty:
+            self.redraw()
+            return True
+
+        return False
+
+    def composite(self, surface, camera):
+        self.refresh(camera)
+        if self.rect.width and self.rect.height:
+            _track(surface, surface.blit(self.surface, self.rect, self.rect))
+
+
 class Window:
-    def __init__(self, width=800, height=450, fullscreen=False, title="Game", max_fps=60, icon=None):
+    def __init__(self, width=800, height=450, fullscreen=False, title="Game", max_fps=60, icon=None, dirty_rects=False,
+                 render_scale=1.0, smooth_scaling=False, dynamic_scale=False, min_scale=0.5, max_scale=1.0, pacing="tick", frame_history=300):
+        """
+        With dirty_rects=True only the areas drawn this frame (and the ones drawn last frame) are sent to the display.
+        Use restore() instead of clear() in that mode so only the damaged regions get cleared.
+
+        render_scale != 1 draws into an internal SURFACE of (width * render_scale, height * render_scale) pixels that present()
+        stretches onto the DISPLAY, with smooth_scaling or nearest neighbour. World coordinates, the mouse position and
+        WIDTH / HEIGHT stay in display pixels, and shapes, line widths, text and sprites keep their size on the display. With dynamic_scale=True run() moves the scale between min_scale and max_scale
+        to hold MAX_FPS. When scaling, present() always updates the whole display, even with dirty_rects.
+
+        Layers (add_layer) with order < 0 are drawn under the frame by clear() and restore(),
+        the ones with order >= 0 are drawn over it by run() after update().
+
+        pacing is how run() waits for the next frame:
+        "tick" uses clock.tick(MAX_FPS), "precise" sleeps until spin_time before the frame is due and busy waits the rest,
+        "vsync" opens the display with vsync and lets present() wait for the monitor (falls back to "precise" if vsync isn't available).
+        The times between the last frame_history presented frames are kept in frame_times, see frame_stats().
+        """
         self.running = True
         self.WIDTH = width
         self.HEIGHT = height
-        self.SURFACE = pygame.display.set_mode((self.WIDTH, self.HEIGHT), pygame.FULLSCREEN if fullscreen else 0)
+        init("display", "font")
+        flags = pygame.FULLSCREEN if fullscreen else 0
+        self.DISPLAY = None
+        if pacing == "vsync":
+            # vsync needs SCALED (or OPENGL), with the same logical size as the window it doesn't change anything else.
+            # pygame warns instead of failing when it only gets a software renderer, which can't do vsync
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                try:
+                    self.DISPLAY = pygame.display.set_mode((self.WIDTH, self.HEIGHT), flags | pygame.SCALED, vsync=1)
+                except pygame.error:
+                    pass
+            if self.DISPLAY is None or caught:
+                pacing = "precise"
+        if self.DISPLAY is None:
+            self.DISPLAY = pygame.display.set_mode((self.WIDTH, self.HEIGHT), flags)
+        self.SURFACE = self.DISPLAY
         self.delta_time = 1 / max_fps
 
         pygame.display.set_caption(title)
@@ -625,13 +3034,272 @@ class Window:
         self.MAX_FPS = max_fps
 
         self.clock = pygame.time.Clock()
-    
+
+        self.camera = Camera()
+        self.camera.update(self.WIDTH, self.HEIGHT)
+
+        # Set by run() when a fixed_update is used
+        self.fixed_delta_time = 1 / max_fps
+        self.alpha = 1.0
+
+        self.dirty_rects_enabled = dirty_rects
+        self.dirty_rects = []
+        self.last_dirty_rects = []
+        self.restored_rects = []
+        self.skipped_rects = []
+        self.background = None
+
+        self.layers = []
+
+        self.render_scale = 1.0
+        self.smooth_scaling = smooth_scaling
+        self.dynamic_scale = dynamic_scale
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.scale_step = 0.05
+        self.scale_cooldown = 30
+        self.frames_since_scale = 0
+        self.work_time = 0.0
+        self.set_render_scale(render_scale)
+
+        self.pacing = pacing
+        self.spin_time = 0.002
+        self.next_frame_time = time.perf_counter()
+        self.last_present_time = None
+        self.frame_times = deque(maxlen=frame_history)
+        self.skipped_frames = 0
+
+    def set_render_scale(self, scale):
+        """
+        Changes the resolution of SURFACE to scale times the display size (1 draws straight on the display).
+        The old frame is lost and all layers are redrawn.
+        """
+        width, height = max(round(self.WIDTH * scale), 1), max(round(self.HEIGHT * scale), 1)
+        if (width, height) == self.SURFACE.get_size() and scale == self.render_scale:
+            return
+
+        self.render_scale = scale
+        if (width, height) == self.DISPLAY.get_size():
+            self.SURFACE = self.DISPLAY
+        else:
+            self.SURFACE = pygame.Surface((width, height), 0, self.DISPLAY)
+
+        # the real ratio after rounding, so screen and mouse positions line up exactly
+        self.camera.update(width, height, width / self.WIDTH)
+        for layer in self.layers:
+            layer.resize(width, height)
+
+        self.dirty_rects = []
+        self.last_dirty_rects = []
+        self.restored_rects = []
+
+    def adjust_render_scale(self, work_time):
+        """
+        Lowers the render scale when a frame (without the time spent waiting for MAX_FPS) takes longer than the frame budget
+        and raises it again when there is plenty of time left. Called by run() every frame with dynamic_scale=True.
+        """
+        # smoothed so a single slow frame doesn't change the resolution
+        self.work_time += (work_time - self.work_time) * 0.1
+        self.frames_since_scale += 1
+        if self.frames_since_scale < self.scale_cooldown:
+            return
+
+        budget = 1 / self.MAX_FPS
+        scale = self.render_scale
+        if self.work_time > budget * 0.9:
+            scale = max(self.render_scale - self.scale_step, self.min_scale)
+        elif self.work_time < budget * 0.6:
+            scale = min(self.render_scale + self.scale_step, self.max_scale)
+
+        if scale != self.render_scale:
+            self.set_render_scale(round(scale, 4))
+            self.frames_since_scale = 0
+
+    def wait_for_frame(self):
+        """
+        Waits until the next frame is due, depending on pacing (see __init__).
+        """
+        if self.pacing == "precise":
+            remaining = self.next_frame_time - time.perf_counter()
+            # sleep() can overshoot by a millisecond or more, spin for the last part
+            if remaining > self.spin_time:
+                time.sleep(remaining - self.spin_time)
+            while time.perf_counter() < self.next_frame_time:
+                pass
+            self.clock.tick()
+        elif self.pacing == "vsync":
+            self.clock.tick()
+        else:
+            self.clock.tick(self.MAX_FPS)
+
+    def schedule_next_frame(self, max_late_frames=5):
+        budget = 1 / self.MAX_FPS
+        if self.pacing != "precise":
+            # clock.tick and vsync decide the timing themselves, the next frame is due one frame after the last one shown
+            if self.last_present_time is not None:
+                self.next_frame_time = self.last_present_time + budget
+            return
+
+        # frames are due at fixed intervals, if the loop is too far behind it starts counting from now instead of catching up
+        self.next_frame_time += budget
+        now = time.perf_counter()
+        if now - self.next_frame_time > budget * max_late_frames:
+            self.next_frame_time = now + budget
+
+    def is_behind(self):
+        """
+        True if the next frame should have been shown more than one frame ago.
+        """
+        return time.perf_counter() - self.next_frame_time > 1 / self.MAX_FPS
+
+    def skip_present(self):
+        """
+        Ends the frame without showing it (frame skipping). In dirty rectangle mode the areas are shown with the next present().
+        """
+        self.skipped_frames += 1
+        if self.dirty_rects_enabled:
+            rects = merge_rects(self.dirty_rects)
+            self.skipped_rects.extend(rects + self.restored_rects)
+            self.last_dirty_rects = rects
+            self.dirty_rects = []
+            self.restored_rects = []
+
+    def frame_stats(self):
+        """
+        Returns {"mean", "jitter", "p95", "p99", "min", "max", "fps", "skipped"} over frame_times.
+        Times are milliseconds between presented frames, jitter is their standard deviation.
+        """
+        if not self.frame_times:
+            return {"mean": 0.0, "jitter": 0.0, "p95": 0.0, "p99": 0.0, "min": 0.0, "max": 0.0, "fps": 0.0, "skipped": self.skipped_frames}
+
+        times = np.array(self.frame_times) * 1000
+        p95, p99 = np.percentile(times, (95, 99))
+        mean = float(times.mean())
+        return {"mean": mean, "jitter": float(times.std()), "p95": float(p95), "p99": float(p99), "min": float(times.min()), "max": float(times.max()),
+                "fps": 1000 / mean if mean > 0 else 0.0, "skipped": self.skipped_frames}
+
+    def add_layer(self, name, draw=None, order=-1, transparent=True, follow_camera=True):
+        """
+        Creates a Layer, see Layer. Layers are composited in ascending order.
+        """
+        width, height = self.SURFACE.get_size()
+        layer = Layer(name, width, height, draw, order, transparent, follow_camera)
+        self.layers.append(layer)
+        self.layers.sort(key=lambda layer: layer.order)
+        return layer
+
+    def get_layer(self, name):
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+
+        return None
+
+    def remove_layer(self, name):
+        self.layers = [layer for layer in self.layers if layer.name != name]
+
+    def invalidate_layers(self):
+        for layer in self.layers:
+            layer.invalidate()
+
+    def draw_layers(self, below):
+        """
+        Composites the visible layers under the frame (below=True, order < 0) or over it (below=False, order >= 0).
+        """
+        for layer in self.layers:
+            if layer.visible and (layer.order < 0) == below:
+                layer.composite(self.SURFACE, self.camera)
+
     def clear(self, color: Color = Color()):
         self.SURFACE.fill(color.tup())
+        if self.dirty_rects_enabled:
+            self.dirty_rects.append(self.SURFACE.get_rect())
+        self.draw_layers(True)
+
+    def mark_dirty(self, rect):
+        """
+        Adds a screen rectangle to the areas updated this frame (for drawing done without the draw helpers).
+        """
+        if self.dirty_rects_enabled:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def restore(self, color: Color = Color()):
+        """
+        Clears only the regions drawn last frame, copying them from self.background if it is set or filling them with color,
+        then from the layers under the frame.
+        """
+        below = [layer for layer in self.layers if layer.visible and layer.order < 0]
+        if any([layer.refresh(self.camera) for layer in below]):
+            # a layer under the frame changed, so everything has to be redrawn
+            if self.background is not None:
+                self.SURFACE.blit(self.background, (0, 0))
+                self.mark_dirty(self.SURFACE.get_rect())
+                self.draw_layers(True)
+            else:
+                self.clear(color)
+            self.restored_rects = self.last_dirty_rects
+            self.last_dirty_rects = []
+            return
+
+        for rect in self.last_dirty_rects:
+            if self.background is not None:
+                self.SURFACE.blit(self.background, rect, rect)
+            else:
+                self.SURFACE.fill(color.tup(), rect)
+            for layer in below:
+                self.SURFACE.blit(layer.surface, rect, rect)
+
+        # the restored regions are updated on the display this frame, but not cleared again next frame
+        self.restored_rects = self.last_dirty_rects
+        self.last_dirty_rects = []
+
+    def present(self):
+        """
+        Shows the frame, either with a full flip or by updating the merged dirty rectangles.
+        With a render scale the SURFACE is stretched onto the display first.
+        """
+        self.record_present()
+
+        if self.SURFACE is not self.DISPLAY:
+            if self.smooth_scaling:
+                pygame.transform.smoothscale(self.SURFACE, self.DISPLAY.get_size(), self.DISPLAY)
+            else:
+                pygame.transform.scale(self.SURFACE, self.DISPLAY.get_size(), self.DISPLAY)
+
+            if self.dirty_rects_enabled:
+                # restore() still needs the rectangles, but the whole display changed
+                self.last_dirty_rects = merge_rects(self.dirty_rects)
+                self.dirty_rects = []
+                self.restored_rects = []
+                self.skipped_rects = []
+            pygame.display.flip()
+            return
+
+        if not self.dirty_rects_enabled:
+            pygame.display.flip()
+            return
+
+        rects = merge_rects(self.dirty_rects)
+        pygame.display.update(merge_rects(rects + self.restored_rects + self.skipped_rects))
+        self.last_dirty_rects = rects
+        self.dirty_rects = []
+        self.restored_rects = []
+        self.skipped_rects = []
+
+    def record_present(self):
+        now = time.perf_counter()
+        if self.last_present_time is not None:
+            self.frame_times.append(now - self.last_present_time)
+        self.last_present_time = now
 
 
 class InputManager:
-    def __init__(self):
+    def __init__(self, event_driven=False):
+        """
+        With event_driven=True the key and mouse button states are built from the KEYDOWN/KEYUP/MOUSEBUTTON events that run() passes to process_event,
+        so update() only costs something when input actually changed.
+        Otherwise the pressed state is polled, and the per-key loop only runs on frames where it differs from the last frame.
+        """
         self.keys_down = {}
         self.keys_held = {}
         self.keys_up = {}
@@ -645,6 +3313,18 @@ class InputManager:
 
         self.mouse_wheel = Vector2()
 
+        self.event_driven = event_driven
+        self.events = []
+        self.last_keys = None
+        self.last_mouse_buttons = None
+
+    def process_event(self, event):
+        """
+        Queues a pygame event for the next update() (only used when event_driven is True).
+        """
+        if self.event_driven and event.type in (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            self.events.append(event)
+
     def update(self):
         # Reset state for up and down events
         self.keys_down.clear()
@@ -653,34 +3333,69 @@ class InputManager:
         self.mouse_buttons_down.clear()
         self.mouse_buttons_up.clear()
 
-        # Update keys
+        if self.event_driven:
+            self.update_from_events()
+        else:
+            self.update_from_state()
+
+        # Mouse movement
+        mouse_pos = pygame.mouse.get_pos()
+        self.mouse_position = window.camera.to_world(*mouse_pos)
+        self.mouse_motion = Vector2(*pygame.mouse.get_rel())
+
+    def update_from_events(self):
+        for event in self.events:
+            if event.type == pygame.KEYDOWN:
+                if not self.keys_held.get(event.key, False):
+                    self.keys_down[event.key] = True
+                self.keys_held[event.key] = True
+            elif event.type == pygame.KEYUP:
+                if self.keys_held.get(event.key, False):
+                    self.keys_up[event.key] = True
+                self.keys_held[event.key] = False
+            elif 1 <= event.button <= 3:
+                # pygame numbers mouse buttons from 1, get_pressed() (and this class) from 0
+                button = event.button - 1
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if not self.mouse_buttons_held.get(button, False):
+                        self.mouse_buttons_down[button] = True
+                    self.mouse_buttons_held[button] = True
+                else:
+                    if self.mouse_buttons_held.get(button, False):
+                        self.mouse_buttons_up[button] = True
+                    self.mouse_buttons_held[button] = False
+
+        self.events.clear()
+
+    def update_from_state(self):
+        # Update keys (comparing whole tuples happens in C, so unchanged frames skip the loop)
         keys = pygame.key.get_pressed()
-        for key_code in range(len(keys)):
-            if keys[key_code]:
-                if not self.keys_held.get(key_code, False):
-                    self.keys_down[key_code] = True
-                self.keys_held[key_code] = True
-            else:
-                if self.keys_held.get(key_code, False):
-                    self.keys_up[key_code] = True
-                self.keys_held[key_code] = False
+        state = tuple(keys)
+        if state != self.last_keys:
+            self.last_keys = state
+            for key_code in range(len(keys)):
+                if keys[key_code]:
+                    if not self.keys_held.get(key_code, False):
+                        self.keys_down[key_code] = True
+                    self.keys_held[key_code] = True
+                else:
+                    if self.keys_held.get(key_code, False):
+                        self.keys_up[key_code] = True
+                    self.keys_held[key_code] = False
 
         # Update mouse
         mouse_buttons = pygame.mouse.get_pressed()
-        for button in range(len(mouse_buttons)):
-            if mouse_buttons[button]:
-                if not self.mouse_buttons_held.get(button, False):
-                    self.mouse_buttons_down[button] = True
-                self.mouse_buttons_held[button] = True
-            else:
-                if self.mouse_buttons_held.get(button, False):
-                    self.mouse_buttons_up[button] = True
-                self.mouse_buttons_held[button] = False
-
-        # Mouse movement
-        mouse_pos = Vector2(*pygame.mouse.get_pos())
-        self.mouse_position = Vector2(mouse_pos.x - window.WIDTH // 2, -mouse_pos.y + window.HEIGHT // 2)
-        self.mouse_motion = Vector2(*pygame.mouse.get_rel())
+        if mouse_buttons != self.last_mouse_buttons:
+            self.last_mouse_buttons = mouse_buttons
+            for button in range(len(mouse_buttons)):
+                if mouse_buttons[button]:
+                    if not self.mouse_buttons_held.get(button, False):
+                        self.mouse_buttons_down[button] = True
+                    self.mouse_buttons_held[button] = True
+                else:
+                    if self.mouse_buttons_held.get(button, False):
+                        self.mouse_buttons_up[button] = True
+                    self.mouse_buttons_held[button] = False
 
     def get_key_down(self, key):
         return self.keys_down.get(key, False)
@@ -713,37 +3428,312 @@ class InputManager:
 input_manager = InputManager()
 
 
-def run(start, update, width=800, height=450, fullscreen=False, title="Game", max_fps=60, icon=None):
-    global window
+# slots of the shared control array of a SimulationWorker
+_BACK, _READY, _FRONT, _FRESH, _STEP = range(5)
 
-    window = Window(width, height, fullscreen, title, max_fps, icon)
 
-    start()
+def _simulate(step, state, buffers, control, lock, inputs, stop_event, delta_time):
+    # worker loop, the same for threads and processes: step, copy into the back buffer, swap it with the ready one
+    next_time = time.perf_counter()
+    while not stop_event.is_set():
+        pending = []
+        while True:
+            try:
+                pending.append(inputs.get_nowait())
+            except queue.Empty:
+                break
+
+        step(state, pending, delta_time)
 
-    get_ticks_last_frame = 0
+        back = buffers[control[_BACK]]
+        for name, array in state.items():
+            np.copyto(back[name], array)
 
-    while window.running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                window.running = False
-            if event.type == pygame.MOUSEWHEEL:
-                input_manager.mouse_wheel = Vector2(event.x, event.y)
+        with lock:
+            control[_BACK], control[_READY] = control[_READY], control[_BACK]
+            control[_FRESH] = 1
+            control[_STEP] += 1
 
-        # Update input states
-        input_manager.update()
+        next_time += delta_time
+        remaining = next_time - time.perf_counter()
+        if remaining > 0:
+            stop_event.wait(remaining)
+        elif remaining < -delta_time * 5:
+            # too far behind, don't try to catch up
+            next_time = time.perf_counter()
 
-        update()
 
-        input_manager.mouse_wheel = Vector2()
+def _simulate_process(step, layout, control, inputs, stop_event, delta_time):
+    # entry point of the worker process, attaches to the shared buffers of SimulationWorker
+    from multiprocessing import shared_memory
 
-        window.clock.tick(window.MAX_FPS)
-        t = pygame.time.get_ticks()
-        window.delta_time = (t - get_ticks_last_frame) / 1000.0
-        get_ticks_last_frame = t
+    memories = {name: shared_memory.SharedMemory(name=memory_name) for name, (memory_name, shape, dtype) in layout.items()}
+    try:
+        blocks = {name: np.ndarray((3, *shape), dtype, buffer=memories[name].buf) for name, (memory_name, shape, dtype) in layout.items()}
+        buffers = [{name: block[i] for name, block in blocks.items()} for i in range(3)]
+        state = {name: block[control[_READY]].copy() for name, block in blocks.items()}
+        _simulate(step, state, buffers, control, control.get_lock(), inputs, stop_event, delta_time)
+    finally:
+        blocks = buffers = None
+        for memory in memories.values():
+            memory.close()
 
-        pygame.display.flip()
 
-    pygame.quit()
+class SimulationWorker:
+    """
+    Runs step(state, inputs, delta_time) at a fixed rate in the background, so a slow simulation doesn't hold up the render loop.
+
+    state is a dict of numpy arrays that step changes in place, inputs is the list of everything push_input() sent since the last step.
+    After every step the state is copied into a set of three buffers: the worker writes the back one, the newest finished one
+    is kept ready and the renderer reads the front one, so neither side ever waits for the other or sees a half updated state.
+
+    snapshot() returns the newest state (a dict of read only arrays) and keeps it stable until the next snapshot() call.
+    With use_process=True the worker is a separate process (no GIL) and the buffers live in shared memory.
+    step then has to be a module level function and the script needs the usual if __name__ == "__main__": guard.
+
+    run(..., simulation=worker) starts and stops the worker with the game loop.
+    """
+    def __init__(self, step, state, delta_time=1 / 120, use_process=False):
+        self.step = step
+        self.delta_time = delta_time
+        self.use_process = use_process
+        self.initial_state = {name: np.array(array) for name, array in state.items()}
+        self.worker = None
+        self.error = None
+        self.memories = []
+
+    def start(self):
+        if self.worker is not None:
+            return
+
+        if self.use_process:
+            self.start_process()
+        else:
+            self.start_thread()
+
+        self.front = {}
+        self.snapshot_step = 0
+        self.acquire_front()
+
+    def start_thread(self):
+        self.buffers = [{name: array.copy() for name, array in self.initial_state.items()} for _ in range(3)]
+        self.control = [0, 1, 2, 0, 0]
+        self.lock = threading.Lock()
+        self.inputs = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        state = {name: array.copy() for name, array in self.initial_state.items()}
+
+        def target():
+            try:
+                _simulate(self.step, state, self.buffers, self.control, self.lock, self.inputs, self.stop_event, self.delta_time)
+            except BaseException as error:
+                self.error = error
+
+        self.worker = threading.Thread(target=target, name="SimulationWorker", daemon=True)
+        self.worker.start()
+
+    def start_process(self):
+        # only imported when needed, multiprocessing isn't free to import
+        import multiprocessing
+        from multiprocessing import shared_memory
+
+        layout = {}
+        blocks = {}
+        for name, array in self.initial_state.items():
+            memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes * 3, 1))
+            self.memories.append(memory)
+            block = np.ndarray((3, *array.shape), array.dtype, buffer=memory.buf)
+            block[:] = array
+            blocks[name] = block
+            layout[name] = (memory.name, array.shape, array.dtype.str)
+
+        self.buffers = [{name: block[i] for name, block in blocks.items()} for i in range(3)]
+        self.control = multiprocessing.Array("q", [0, 1, 2, 0, 0])
+        self.lock = self.control.get_lock()
+        self.inputs = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+
+        self.worker = multiprocessing.Process(target=_simulate_process, args=(self.step, layout, self.control, self.inputs, self.stop_event, self.delta_time),
+                                              name="SimulationWorker", daemon=True)
+        self.worker.start()
+
+    def stop(self, timeout=1.0):
+        if self.worker is None:
+            return
+
+        self.stop_event.set()
+        self.worker.join(timeout)
+        if self.use_process:
+            if self.worker.is_alive():
+                self.worker.terminate()
+                self.worker.join()
+            self.inputs.close()
+
+        self.worker = None
+        self.front = {}
+        self.buffers = None
+        for memory in self.memories:
+            try:
+                memory.close()
+            except BufferError:
+                # a snapshot array is still referenced somewhere, the memory is freed with it
+                pass
+            memory.unlink()
+        self.memories = []
+
+    def push_input(self, item):
+        """
+        Sends anything (picklable with use_process) to the worker, it gets it in the inputs list of the next step.
+        """
+        self.inputs.put(item)
+
+    def acquire_front(self):
+        with self.lock:
+            if self.control[_FRESH]:
+                self.control[_FRONT], self.control[_READY] = self.control[_READY], self.control[_FRONT]
+                self.control[_FRESH] = 0
+            front = self.control[_FRONT]
+            # the front buffer always holds the newest finished step
+            self.snapshot_step = self.control[_STEP]
+
+        self.front = {}
+        for name, array in self.buffers[front].items():
+            view = array.view()
+            view.flags.writeable = False
+            self.front[name] = view
+
+    def snapshot(self):
+        """
+        Returns the newest finished state as {name: read only array}. The arrays stay valid until the next snapshot() call.
+        """
+        self.check()
+        self.acquire_front()
+        return self.front
+
+    def check(self):
+        # re-raises a crash of the worker in the render loop
+        if self.error is not None:
+            raise RuntimeError("The simulation worker stopped because of an error") from self.error
+        if self.use_process and self.worker is not None and self.worker.exitcode not in (None, 0):
+            raise RuntimeError(f"The simulation worker process exited with code {self.worker.exitcode}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def run(start, update, width=800, height=450, fullscreen=False, title="Game", max_fps=60, icon=None, event_input=False, dirty_rects=False,
+        fixed_update=None, fixed_delta_time=1 / 120, max_fixed_steps=5, profile=False, render_scale=1.0, smooth_scaling=False, dynamic_scale=False,
+        pacing="tick", frame_skip=False, max_frame_skip=2, simulation=None):
+    """
+    Runs start() once and then update() once per frame until window.running is False.
+
+    If fixed_update is given, it is called at a fixed rate of 1 / fixed_delta_time per second (as many times per frame as needed, at most max_fixed_steps),
+    independent of the frame rate. window.alpha (0 to 1) tells update() how far the current frame is between the last two fixed steps,
+    so it can draw lerp(previous_state, state, window.alpha).
+
+    profile=True enables the global profiler, which then records the loop phases (events, input, fixed_update, update, tick, present) every frame.
+
+    render_scale, smooth_scaling and dynamic_scale set up internal resolution scaling, see Window.
+
+    pacing is "tick", "precise" or "vsync", see Window. With frame_skip=True, when the loop is more than a frame behind,
+    update() still runs but the frame isn't shown (at most max_frame_skip frames in a row), so the game catches up.
+    window.frame_stats() reports the frame time jitter.
+
+    simulation is a SimulationWorker that is started after start() and stopped when the loop ends,
+    update() then draws from simulation.snapshot() and sends input with simulation.push_input().
+    """
+    global window
+
+    window = Window(width, height, fullscreen, title, max_fps, icon, dirty_rects, render_scale, smooth_scaling, dynamic_scale, pacing=pacing)
+    window.fixed_delta_time = fixed_delta_time
+    input_manager.event_driven = event_input
+    if profile:
+        profiler.enabled = True
+
+    start()
+    try:
+        if simulation is not None:
+            simulation.start()
+
+        last_frame_time = time.perf_counter()
+        window.next_frame_time = last_frame_time + 1 / window.MAX_FPS
+        accumulator = 0.0
+        skipped = 0
+
+        while window.running:
+            with profiler.scope("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        window.running = False
+                    if event.type == pygame.MOUSEWHEEL:
+                        input_manager.mouse_wheel = Vector2(event.x, event.y)
+                    input_manager.process_event(event)
+
+            window.camera.update()
+
+            # Update input states
+            with profiler.scope("input"):
+                input_manager.update()
+
+            if fixed_update is not None:
+                with profiler.scope("fixed_update"):
+                    accumulator += window.delta_time
+                    steps = 0
+                    while accumulator >= fixed_delta_time and steps < max_fixed_steps:
+                        fixed_update()
+                        accumulator -= fixed_delta_time
+                        steps += 1
+
+                    # Too far behind: drop the time we can't catch up on instead of spiraling
+                    if accumulator >= fixed_delta_time:
+                        accumulator = accumulator % fixed_delta_time
+
+                    window.alpha = accumulator / fixed_delta_time
+
+            with profiler.scope("update"):
+                update()
+
+            input_manager.mouse_wheel = Vector2()
+
+            window.draw_layers(False)
+
+            if profiler.overlay:
+                profiler.draw(window.SURFACE)
+
+            skip = frame_skip and skipped < max_frame_skip and window.is_behind()
+
+            tick_start = time.perf_counter()
+            if not skip:
+                with profiler.scope("tick"):
+                    window.wait_for_frame()
+            t = time.perf_counter()
+            window.delta_time = t - last_frame_time
+            last_frame_time = t
+
+            if skip:
+                window.skip_present()
+                skipped += 1
+            else:
+                with profiler.scope("present"):
+                    window.present()
+                skipped = 0
+
+            window.schedule_next_frame()
+
+            if window.dynamic_scale:
+                window.adjust_render_scale(window.delta_time - (t - tick_start))
+
+            profiler.end_frame()
+    finally:
+        # also when update() raises, so a worker thread or process and its shared memory don't outlive the game
+        if simulation is not None:
+            simulation.stop()
+        shutdown()
 
 def get_window():
     return window
@@ -0,0 +1,410 @@
+"""
+Headless benchmarks for the hot paths of pg_extensions.
+
+Runs under SDL's dummy video driver, so no display is needed:
+
+    python -m pg_extensions.benchmark                          # print results
+    python -m pg_extensions.benchmark --output results.json    # save results
+    python -m pg_extensions.benchmark --save baseline.json     # store a baseline
+    python -m pg_extensions.benchmark --compare baseline.json  # compare against it (exit code 1 on regressions)
+
+Every benchmark is run for each scene size and timed with time.perf_counter_ns. Results are the median and
+minimum time of one run in microseconds, keyed by "name/size" (just "name" for benchmarks that don't scale, like import_time).
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse, json, random, statistics, subprocess, sys, time
+
+import numpy as np
+import pygame
+
+import pg_extensions as pg
+
+BENCHMARKS = {}
+UNSIZED = set()
+NOT_COMPARED = set()
+
+
+def benchmark(name, sized=True, compared=True):
+    """
+    Registers a benchmark. The decorated function gets the scene size, does its setup and returns the function to time.
+    Benchmarks with sized=False are run once instead of once per size and get size None.
+    Benchmarks with compared=False are reported but never count as regressions (for noisy measurements like timing jitter).
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        if not sized:
+            UNSIZED.add(name)
+        if not compared:
+            NOT_COMPARED.add(name)
+        return func
+
+    return decorator
+
+
+def setup_window(width=800, height=450):
+    pg.set_window(pg.Window(width, height))
+    return pg.get_window()
+
+
+def random_vectors2(size, extent=400):
+    return [pg.Vector2(random.uniform(-extent, extent), random.uniform(-extent, extent)) for _ in range(size)]
+
+
+def random_vectors3(size, extent=100):
+    return [pg.Vector3(random.uniform(-extent, extent), random.uniform(-extent, extent), random.uniform(-extent, extent)) for _ in range(size)]
+
+
+@benchmark("import_time", sized=False, compared=False)
+def bench_import_time(size):
+    # time of "import pg_extensions" in a fresh interpreter, pygame and numpy included
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    package = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+    code = "import time; start = time.perf_counter_ns(); import {}; print((time.perf_counter_ns() - start) / 1000)"
+
+    def run():
+        output = subprocess.run([sys.executable, "-c", code.format(package)], cwd=root, capture_output=True, text=True, check=True).stdout
+        return float(output.split()[-1])
+
+    return run
+
+
+@benchmark("vector2_operators")
+def bench_vector2_operators(size):
+    a, b = random_vectors2(size), random_vectors2(size)
+
+    def run():
+        for u, v in zip(a, b):
+            ((u + v) * 0.5 - v).normalize().rotate(30).dot(v)
+
+    return run
+
+
+@benchmark("vector3_operators")
+def bench_vector3_operators(size):
+    a, b = random_vectors3(size), random_vectors3(size)
+
+    def run():
+        for u, v in zip(a, b):
+            ((u + v) * 0.5 - v).normalize().dot(v)
+
+    return run
+
+
+@benchmark("rotate_wpp")
+def bench_rotate_wpp(size):
+    points = random_vectors3(size)
+
+    def run():
+        for point in points:
+            pg.wpp(pg.rotate_z(pg.rotate_y(pg.rotate_x(point, 10), 20), 30), 400)
+
+    return run
+
+
+def draw_benchmark(draw):
+    def bench(size):
+        surface = setup_window().SURFACE
+        positions = random_vectors2(size, 200)
+        color = pg.Color.random()
+
+        def run():
+            for position in positions:
+                draw(surface, color, position)
+
+        return run
+
+    return bench
+
+
+benchmark("draw_circle")(draw_benchmark(lambda surface, color, position: pg.draw_circle(surface, color, position, 8)))
+benchmark("draw_circle_2")(draw_benchmark(lambda surface, color, position: pg.draw_circle_2(surface, (*color.tup(), 128), position, 8)))
+benchmark("draw_rectangle")(draw_benchmark(lambda surface, color, position: pg.draw_rectangle(surface, color, position, pg.Vector2(12, 8))))
+benchmark("draw_line")(draw_benchmark(lambda surface, color, position: pg.draw_line(surface, color, position, position + 10)))
+benchmark("draw_polygon")(draw_benchmark(lambda surface, color, position: pg.draw_polygon(surface, color, [position, position + pg.Vector2(10, 0), position + 10])))
+benchmark("set_point")(draw_benchmark(lambda surface, color, position: pg.set_point(surface, position, color)))
+
+
+@benchmark("static_layer")
+def bench_static_layer(size):
+    # the draw_line scene of the same size, drawn once into a layer and composited every frame
+    window = setup_window()
+    positions = random_vectors2(size, 200)
+    color = pg.Color.random()
+
+    def draw(surface):
+        for position in positions:
+            pg.draw_line(surface, color, position, position + 10)
+
+    window.add_layer("static", draw)
+
+    def run():
+        window.clear()
+
+    return run
+
+
+@benchmark("pixel_buffer_set")
+def bench_pixel_buffer_set(size):
+    surface = setup_window().SURFACE
+    points = np.random.uniform(-200, 200, (size, 2))
+    colors = np.random.randint(0, 256, (size, 3))
+
+    def run():
+        with pg.PixelBuffer(surface) as pixels:
+            pixels.set(points, colors)
+
+    return run
+
+
+@benchmark("draw_circles")
+def bench_draw_circles(size):
+    surface = setup_window().SURFACE
+    positions = np.random.uniform(-200, 200, (size, 2))
+
+    return lambda: pg.draw_circles(surface, pg.RED, positions, 8)
+
+
+@benchmark("draw_circles_2")
+def bench_draw_circles_2(size):
+    surface = setup_window().SURFACE
+    positions = np.random.uniform(-200, 200, (size, 2))
+
+    return lambda: pg.draw_circles_2(surface, (255, 0, 0, 128), positions, 8)
+
+
+@benchmark("draw_circles_scaled")
+def bench_draw_circles_scaled(size):
+    # draw_circles at half the display resolution, including the upscale in present()
+    window = pg.Window(800, 450, render_scale=0.5, smooth_scaling=True)
+    pg.set_window(window)
+    positions = np.random.uniform(-200, 200, (size, 2))
+
+    def run():
+        pg.draw_circles(window.SURFACE, pg.RED, positions, 8)
+        window.present()
+
+    return run
+
+
+@benchmark("draw_lines")
+def bench_draw_lines(size):
+    surface = setup_window().SURFACE
+    starts = np.random.uniform(-200, 200, (size, 2))
+
+    return lambda: pg.draw_lines(surface, pg.RED, starts, starts + 10)
+
+
+@benchmark("particles")
+def bench_particles(size):
+    surface = setup_window().SURFACE
+    particles = pg.ParticleSystem(size)
+    particles.emit(size, pg.Vector2(), 10, 200, lifetime_min=1000, lifetime_max=1000)
+
+    def run():
+        particles.update(1 / 60)
+        particles.draw(surface)
+
+    return run
+
+
+@benchmark("sprite_batch")
+def bench_sprite_batch(size):
+    surface = setup_window().SURFACE
+    atlas = pg.TextureAtlas(256, 256)
+    sprites = [atlas.add(pygame.Surface((16, 16))) for _ in range(8)]
+    positions = random_vectors2(size, 200)
+    batch = pg.SpriteBatch()
+
+    def run():
+        for i, position in enumerate(positions):
+            batch.draw(sprites[i % 8], position, i % 3)
+        batch.flush(surface)
+
+    return run
+
+
+@benchmark("text_render")
+def bench_text_render(size):
+    setup_window()
+    font = pg.get_font(None, 24)
+    texts = [pg.Text(f"Label {i % 50}", font, pg.Vector2(0, 0), pg.Text.center, pg.WHITE) for i in range(size)]
+
+    def run():
+        for text in texts:
+            text.render()
+
+    return run
+
+
+@benchmark("button_listen")
+def bench_button_listen(size):
+    setup_window()
+    font = pg.get_font(None, 24)
+    buttons = [pg.Button(pg.Vector2(i % 40 * 20, i // 40 * 20), pg.Vector2(18, 18), True, "B", font, pg.GRAY, pg.WHITE, False, pg.WHITE, 1) for i in range(size)]
+
+    def run():
+        for button in buttons:
+            button.listen()
+
+    return run
+
+
+@benchmark("input_update")
+def bench_input_update(size):
+    setup_window()
+    input_manager = pg.InputManager()
+
+    def run():
+        for _ in range(size):
+            input_manager.update()
+
+    return run
+
+
+@benchmark("collisions")
+def bench_collisions(size):
+    a, b = random_vectors2(size, 100), random_vectors2(size, 100)
+    scale = pg.Vector2(10, 10)
+
+    def run():
+        for u, v in zip(a, b):
+            pg.rect_collision(u, scale, v, scale)
+            pg.circle_collsion(u, 5, v, 5)
+
+    return run
+
+
+@benchmark("run_frame")
+def bench_run_frame(size, frames=11):
+    # full run() loop with a synthetic scene of size circles, returns the average time of one frame
+    positions = random_vectors2(size, 200)
+    frame_times = []
+
+    def update():
+        frame_times.append(time.perf_counter_ns())
+        window = pg.get_window()
+        window.clear()
+        for position in positions:
+            pg.draw_circle(window.SURFACE, pg.WHITE, position, 4)
+        if len(frame_times) >= frames:
+            window.running = False
+
+    def run():
+        frame_times.clear()
+        pg.run(lambda: None, update, max_fps=100000)
+        return (frame_times[-1] - frame_times[0]) / (len(frame_times) - 1) / 1000
+
+    return run
+
+
+@benchmark("pacing_jitter", sized=False, compared=False)
+def bench_pacing_jitter(size, frames=61):
+    # standard deviation of the frame times of an empty scene at 200 fps with precise pacing, in microseconds
+    count = [0]
+
+    def update():
+        count[0] += 1
+        pg.get_window().clear()
+        if count[0] >= frames:
+            pg.get_window().running = False
+
+    def run():
+        count[0] = 0
+        pg.run(lambda: None, update, max_fps=200, pacing="precise")
+        return pg.get_window().frame_stats()["jitter"] * 1000
+
+    return run
+
+
+def measure(func, repeat):
+    """
+    Times func repeat times. If func returns a number, that is used as its own measurement in microseconds.
+    """
+    func()  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        elapsed = func()
+        times.append(elapsed if elapsed is not None else (time.perf_counter_ns() - start) / 1000)
+
+    return {"median_us": statistics.median(times), "min_us": min(times)}
+
+
+def run_benchmarks(sizes=(100, 1000, 10000), names=None, repeat=5):
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+
+        if name in UNSIZED:
+            results[name] = measure(bench(None), repeat)
+            continue
+
+        for size in sizes:
+            random.seed(size)
+            np.random.seed(size)
+            results[f"{name}/{size}"] = measure(bench(size), repeat)
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Returns (name, baseline median, current median, ratio) for every result that got slower than baseline * (1 + tolerance).
+    Benchmarks registered with compared=False are skipped.
+    """
+    regressions = []
+    for name, values in results.items():
+        if name not in baseline or name.split("/")[0] in NOT_COMPARED:
+            continue
+
+        ratio = values["median_us"] / baseline[name]["median_us"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, baseline[name]["median_us"], values["median_us"], ratio))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless pg_extensions benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--save", help="write the results as a baseline to this JSON file")
+    parser.add_argument("--compare", help="compare against this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.only, args.repeat)
+
+    for name, values in results.items():
+        print(f"{name:32} median {values['median_us']:12.1f} us   min {values['min_us']:12.1f} us")
+
+    for path in (args.output, args.save):
+        if path:
+            with open(path, "w") as file:
+                json.dump(results, file, indent=4)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.1f} us -> {after:.1f} us ({ratio:.2f}x)")
+
+        if regressions:
+            return 1
+        print("No regressions against", args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())